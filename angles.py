@@ -0,0 +1,157 @@
+'''
+Модуль содержит таблицы синусов и косинусов для углов, кратных 1 / resolution градуса.
+Почти все углы в игре целые (направление взгляда поворачивается на градус за раз),
+поэтому синусы и косинусы для них можно посчитать один раз заранее, а не звать
+math.cos и math.sin на каждом шаге. Углы, которых нет в таблице, считаются через math,
+как и раньше.
+Арктангенса в таблицах нет: на питоне поиск по таблице выходит в несколько раз
+медленнее, чем math.atan2, поэтому вместо сравнения полярных углов попадание в конус
+зрения проверяется векторными произведениями со сторонами конуса (см. get_wedge).
+Сама проверка попадания точек в конус (get_cone_mask) тоже живёт здесь, чтобы все
+движки поля зрения отсеивали одинаково.
+'''
+
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#Сколько делений таблицы приходится на градус по умолчанию.
+STD_RESOLUTION = 1
+
+class AngleTable:
+    '''
+    Таблица синусов и косинусов.
+    resolution : int -- сколько делений приходится на градус (1 -- только целые градусы,
+    10 -- десятые доли и т.д.).
+    precision : int -- до скольких знаков округлять угол в радианах, прежде чем брать от
+    него синус и косинус (None -- не округлять). Нужно, чтобы таблица давала ровно то же,
+    что и старый способ в GameMap.move_obj.
+    steps : int -- сколько всего делений в таблице (360 * resolution).
+    cos_table, sin_table : array('d') -- значения для углов 0, 1 / resolution, ...
+    градусов (до 360, не включая).
+    '''
+    def __init__(self, resolution=STD_RESOLUTION, precision=None):
+        if resolution < 1 or resolution != int(resolution):
+            raise ValueError('В градусе должно быть целое положительное число делений, а не вот это.')
+        self.resolution = int(resolution)
+        self.precision = precision
+        self.steps = 360 * self.resolution
+        self.cos_table = array('d', (math.cos(self.get_radians(step / self.resolution))\
+        for step in range(self.steps)))
+        self.sin_table = array('d', (math.sin(self.get_radians(step / self.resolution))\
+        for step in range(self.steps)))
+
+    def get_radians(self, angle):
+        '''
+        Переводит угол angle : float из градусов в радианы (с округлением до precision).
+        '''
+        radians = angle * math.pi / 180
+        if self.precision is not None:
+            radians = round(radians, self.precision)
+        return radians
+
+    def get_step(self, angle):
+        '''
+        Возвращает номер деления таблицы (int) для угла angle : float или None, если угол
+        не попадает ровно на деление.
+        '''
+        if type(angle) is int:
+            return angle * self.resolution % self.steps
+        step = angle * self.resolution
+        if step != int(step):
+            return None
+        return int(step) % self.steps
+
+    def cos(self, angle):
+        '''
+        Возвращает косинус угла angle : float (в градусах).
+        '''
+        step = self.get_step(angle)
+        if step is None:
+            return math.cos(self.get_radians(angle % 360))
+        return self.cos_table[step]
+
+    def sin(self, angle):
+        '''
+        Возвращает синус угла angle : float (в градусах).
+        '''
+        step = self.get_step(angle)
+        if step is None:
+            return math.sin(self.get_radians(angle % 360))
+        return self.sin_table[step]
+
+    def get_wedge(self, left_angle, right_angle, eps=0):
+        '''
+        Возвращает стороны угла, который идёт против часовой стрелки от left_angle : float
+        до right_angle : float градусов, в виде (left_x, left_y, right_x, right_y, slack).
+        Точка (x, y) (относительно вершины угла) лежит в нём, расширенном на eps : float
+        градусов с каждой стороны, если для обоих произведений
+        left_x * y - left_y * x и x * right_y - y * right_x верно:
+        произведение >= 0 или произведение ** 2 <= slack * (x ** 2 + y ** 2).
+        Годится только для углов (вместе с eps) меньше 180 градусов.
+        '''
+        slack = math.sin(eps * math.pi / 180) ** 2
+        return (self.cos(left_angle), self.sin(left_angle), self.cos(right_angle),\
+        self.sin(right_angle), slack)
+
+    def get_cone_mask(self, xs, ys, left_angle, right_angle, eps=0, width=None):
+        '''
+        Проверяет, какие точки лежат в угле, который идёт против часовой стрелки от
+        left_angle : float до right_angle : float градусов, расширенном на eps : float
+        градусов с каждой стороны.
+        xs, ys -- координаты точек относительно вершины угла: массивы numpy (тогда
+        возвращается маска numpy) или списки (тогда возвращается список bool).
+        width : float -- ширина угла в градусах (по умолчанию (right_angle - left_angle) % 360;
+        задаётся, чтобы отличить полный круг от пустого угла).
+        Угол меньше 180 градусов проверяется векторными произведениями (см. get_wedge),
+        больший -- арктангенсами, а полный круг пропускает всё.
+        '''
+        vectorized = numpy is not None and isinstance(xs, numpy.ndarray)
+        if width is None:
+            width = (right_angle - left_angle) % 360
+        if width + 2 * eps >= 360:
+            if vectorized:
+                return numpy.ones(len(xs), dtype=bool)
+            return [True] * len(xs)
+        if width + 2 * eps < 180:
+            left_x, left_y, right_x, right_y, slack = self.get_wedge(left_angle, right_angle, eps)
+            if vectorized:
+                dist = xs * xs + ys * ys
+                mask = numpy.ones(len(xs), dtype=bool)
+                for cross in (left_x * ys - left_y * xs, xs * right_y - ys * right_x):
+                    mask &= (cross >= 0) | (cross * cross <= slack * dist)
+                return mask
+            mask = []
+            for x, y in zip(xs, ys):
+                dist = x * x + y * y
+                left_cross = left_x * y - left_y * x
+                right_cross = x * right_y - y * right_x
+                mask.append((left_cross >= 0 or left_cross * left_cross <= slack * dist)\
+                and (right_cross >= 0 or right_cross * right_cross <= slack * dist))
+            return mask
+        if vectorized:
+            polar_angle = (numpy.arctan2(ys, xs) * 180 / math.pi - left_angle) % 360
+            return (polar_angle <= width + eps) | (polar_angle >= 360 - eps)
+        mask = []
+        for x, y in zip(xs, ys):
+            polar_angle = (math.atan2(y, x) * 180 / math.pi - left_angle) % 360
+            mask.append(polar_angle <= width + eps or polar_angle >= 360 - eps)
+        return mask
+
+    def get_accuracy(self, low=-720, high=720):
+        '''
+        Сравнивает таблицу с обычным способом (math.cos и math.sin от угла как есть, без
+        приведения к промежутку от 0 до 360) на всех делениях от low : int до high : int
+        градусов и возвращает наибольшие расхождения {'cos' : float, 'sin' : float}.
+        '''
+        accuracy = {'cos' : 0.0, 'sin' : 0.0}
+        for step in range(low * self.resolution, high * self.resolution):
+            angle = step / self.resolution
+            radians = self.get_radians(angle)
+            accuracy['cos'] = max(accuracy['cos'], abs(self.cos(angle) - math.cos(radians)))
+            accuracy['sin'] = max(accuracy['sin'], abs(self.sin(angle) - math.sin(radians)))
+        return accuracy
@@ -0,0 +1,160 @@
+'''
+Модуль содержит менеджер ресурсов (картинок, шрифтов и всего, что долго грузится).
+Ресурс загружается, только когда к нему впервые обратились (или заранее, в фоновом
+потоке, см. AssetManager.preload), так что до первого кадра грузится только то, что в нём
+нужно.
+Картинки после первой загрузки из PNG дополнительно складываются на диск в виде сырых
+пикселей (в формате, в котором их держит pygame после convert_alpha), и в следующий раз
+не декодируются, а отображаются в память (mmap) прямо в поверхность. Кэш привязан к
+полному пути и ко времени изменения исходного файла: поменяли PNG -- картинка
+перечитается, а одноимённые картинки из разных папок друг другу не мешают.
+'''
+
+import glob
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+import pygame
+
+#Папка для кэша сырых пикселей.
+STD_CACHE_DIR = './.asset_cache'
+#Заголовок файла кэша: MAGIC, ширина и высота картинки.
+CACHE_MAGIC = b'ZRGB'
+CACHE_HEADER = struct.Struct('<4sII')
+#В каком порядке байты пикселей лежат в кэше (так же, как после convert_alpha).
+CACHE_FORMAT = 'BGRA'
+
+class AssetManager(dict):
+    '''
+    Словарь ресурсов, который сам загружает недостающее: pictures[key] для ещё не
+    загруженного ключа зовёт загрузчик этого ключа и запоминает результат. Всё, что
+    кладётся в словарь как обычно, просто лежит в нём (цвета, кэши и т.д.).
+    loaders : {str : function} -- загрузчики ресурсов (функции без аргументов).
+    cache_dir : str -- папка для кэша сырых пикселей (None -- без кэша).
+    lock : threading.RLock -- чтобы фоновая загрузка и основной поток не грузили одно и то
+    же дважды.
+    loads, cache_hits : int -- сколько картинок загружено из PNG и сколько -- из кэша.
+    '''
+    def __init__(self, cache_dir=STD_CACHE_DIR):
+        super().__init__()
+        self.loaders = dict()
+        self.cache_dir = cache_dir
+        self.lock = threading.RLock()
+        self.loads = 0
+        self.cache_hits = 0
+
+    def add_loader(self, key, loader):
+        '''
+        Регистрирует ресурс key : str, который при первом обращении загрузится вызовом
+        loader().
+        '''
+        self.loaders[key] = loader
+
+    def add_image(self, key, path):
+        '''
+        Регистрирует картинку key : str из файла path : str.
+        '''
+        self.add_loader(key, lambda: self.load_image(path))
+
+    def __missing__(self, key):
+        if not key in self.loaders:
+            raise KeyError(key)
+        with self.lock:
+            if not dict.__contains__(self, key):
+                self[key] = self.loaders[key]()
+            return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.loaders
+
+    def is_loaded(self, key):
+        '''
+        Возвращает истину, если ресурс key : str уже загружен.
+        '''
+        return dict.__contains__(self, key)
+
+    def preload(self, keys=None):
+        '''
+        Запускает фоновый поток, который загружает ресурсы keys : [str] (по умолчанию --
+        все зарегистрированные), и возвращает его (threading.Thread).
+        '''
+        if keys is None:
+            keys = list(self.loaders)
+        def load_all():
+            for key in keys:
+                self[key]
+        thread = threading.Thread(target=load_all, daemon=True)
+        thread.start()
+        return thread
+
+    def get_cache_name(self, path):
+        '''
+        Возвращает начало имени файла кэша для картинки path : str: её имя и хэш полного
+        пути к ней (чтобы a/zombie.png и b/zombie.png не делили один кэш).
+        '''
+        name = os.path.splitext(os.path.basename(path))[0]
+        return name + '.' + hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+
+    def get_cache_path(self, path):
+        '''
+        Возвращает путь к файлу кэша для картинки path : str (в имени -- время изменения
+        картинки, так что устаревший кэш просто не найдётся).
+        '''
+        return os.path.join(self.cache_dir, self.get_cache_name(path) + '.' + str(os.stat(path).st_mtime_ns) + '.raw')
+
+    def load_image(self, path):
+        '''
+        Загружает картинку path : str: из кэша сырых пикселей, если он есть и не устарел,
+        иначе (или если кэш испорчен) -- из файла, и кладёт её в кэш.
+        '''
+        if self.cache_dir is None:
+            self.loads += 1
+            return pygame.image.load(path).convert_alpha()
+        cache_path = self.get_cache_path(path)
+        if os.path.exists(cache_path):
+            try:
+                image = read_raw(cache_path)
+                self.cache_hits += 1
+                return image
+            except ValueError:
+                #Кэш испорчен -- перечитываем картинку и пишем его заново.
+                pass
+        self.loads += 1
+        image = pygame.image.load(path).convert_alpha()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        name = self.get_cache_name(path)
+        for old_path in glob.glob(os.path.join(glob.escape(self.cache_dir), glob.escape(name) + '.*.raw')):
+            os.remove(old_path)
+        write_raw(cache_path, image)
+        return image
+
+def write_raw(path, image):
+    '''
+    Записывает пиксели картинки image : pygame.Surface в файл path : str (см. read_raw).
+    Пишет во временный файл и переименовывает, чтобы никто не прочитал недописанный.
+    '''
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as output_file:
+        output_file.write(CACHE_HEADER.pack(CACHE_MAGIC, image.get_width(), image.get_height()))
+        output_file.write(pygame.image.tobytes(image, CACHE_FORMAT))
+    os.replace(temp_path, path)
+
+def read_raw(path):
+    '''
+    Отображает файл path : str, записанный write_raw, в память и возвращает картинку
+    (pygame.Surface), пиксели которой лежат прямо в отображении. Отображение
+    копируемое при записи (ACCESS_COPY), так что рисовать на картинке можно: файл от этого
+    не поменяется.
+    '''
+    with open(path, 'rb') as input_file:
+        buffer = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_COPY)
+    if len(buffer) >= CACHE_HEADER.size:
+        magic, width, height = CACHE_HEADER.unpack_from(buffer, 0)
+    if len(buffer) < CACHE_HEADER.size or magic != CACHE_MAGIC\
+    or len(buffer) != CACHE_HEADER.size + width * height * 4:
+        buffer.close()
+        raise ValueError('Файл кэша картинки ' + path + ' испорчен, тут без вариантов.')
+    return pygame.image.frombuffer(memoryview(buffer)[CACHE_HEADER.size:], (width, height), CACHE_FORMAT)
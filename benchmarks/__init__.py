@@ -0,0 +1,4 @@
+'''
+Замеры производительности игры. Запускаются из корня репозитория, например:
+python -m benchmarks.object_store
+'''
@@ -0,0 +1,98 @@
+'''
+Проверяет таблицы синусов и косинусов (angles.AngleTable) против обычного способа через
+math и сравнивает их скорость.
+Старый способ округлял радианы до PRECISION знаков, не приводя угол к промежутку от 0 до
+360, поэтому для углов из этого промежутка таблица с precision совпадает с ним точно, а
+за его пределами расходится на округление (таблица там точнее). GameMap.apply_action
+держит направление взгляда в этом промежутке, и check_move_steps проверяет, что для
+каждого направления, до которого можно довернуться, шаг move_obj в точности тот же, что
+и раньше. Если хоть один шаг разошёлся, выходит с кодом 1.
+Запуск: python -m benchmarks.angles [деления на градус ...]
+'''
+
+import math
+import sys
+import time
+
+import angles
+import game_map
+
+STD_RESOLUTIONS = [1, 10, 100]
+STD_STEPS = 100000
+
+def time_trig(table, steps):
+    '''
+    Замеряет, сколько секунд уходит на steps : int пар синус-косинус для целых углов по
+    таблице table : angles.AngleTable и старым способом (math от округлённых радиан,
+    как раньше в move_obj).
+    '''
+    start = time.perf_counter()
+    for step in range(steps):
+        table.cos(step % 360)
+        table.sin(step % 360)
+    table_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for step in range(steps):
+        sight_angle = round(step % 360 * math.pi / 180, game_map.PRECISION)
+        math.cos(sight_angle)
+        math.sin(sight_angle)
+    math_time = time.perf_counter() - start
+    return table_time, math_time
+
+def get_reachable_dirs(start=90):
+    '''
+    Возвращает отсортированный список направлений взгляда, до которых можно дойти из
+    start : int поворотами и разворотами (через GameMap.apply_action).
+    '''
+    scene = game_map.GameMap()
+    reachable = {start}
+    queue = [start]
+    while queue:
+        sight_dir = queue.pop()
+        for action in ('turn_left', 'turn_right', 'flip'):
+            scene.sight_dir = sight_dir
+            scene.apply_action(action)
+            if not scene.sight_dir in reachable:
+                reachable.add(scene.sight_dir)
+                queue.append(scene.sight_dir)
+    return sorted(reachable)
+
+def check_move_steps():
+    '''
+    Для каждого направления из get_reachable_dirs делает шаг вперёд и назад через
+    GameMap.move_obj и сравнивает его со старым расчётом (синус и косинус от радиан,
+    округлённых до PRECISION). Возвращает список направлений, где шаг разошёлся.
+    '''
+    scene = game_map.GameMap()
+    scene.add_object('zombie', (0, 0), True)
+    wrong = []
+    for sight_dir in get_reachable_dirs():
+        sight_angle = round(sight_dir * math.pi / 180, game_map.PRECISION)
+        for way in (1, -1):
+            scene.objects[scene.sight].coords = (0, 0)
+            scene.sight_dir = sight_dir
+            scene.move_obj(way)
+            old_step = (round(way * math.cos(sight_angle), game_map.PRECISION),\
+            round(way * math.sin(sight_angle), game_map.PRECISION))
+            if scene.objects[scene.sight].coords != old_step:
+                wrong.append(sight_dir)
+    return wrong
+
+def main(resolutions):
+    for resolution in resolutions:
+        for precision in (None, game_map.PRECISION):
+            table = angles.AngleTable(resolution, precision)
+            for low, high in ((0, 360), (-720, 720)):
+                accuracy = table.get_accuracy(low, high)
+                print('resolution {:>4}, precision {}, angles {}..{}: cos error {:.3g}, sin error {:.3g}'.format(\
+                resolution, precision, low, high, accuracy['cos'], accuracy['sin']))
+    table_time, math_time = time_trig(game_map.MOVE_ANGLES, STD_STEPS)
+    print('{} sin/cos pairs: table {:.3f} s, math {:.3f} s'.format(STD_STEPS, table_time, math_time))
+    wrong = check_move_steps()
+    print('move_obj steps differing from the old math: {} of {} directions {}'.format(len(wrong),\
+    len(get_reachable_dirs()), wrong))
+    return wrong
+
+if __name__ == '__main__':
+    if main([int(arg) for arg in sys.argv[1:]] or STD_RESOLUTIONS):
+        sys.exit(1)
@@ -0,0 +1,95 @@
+'''
+Проверяет, что мир, подгружаемый по кускам (chunks.ChunkedWorld), выглядит так же, как
+та же карта целиком в памяти: наблюдатель бродит по обеим картам одинаково, и в каждом
+шаге сравниваются поле зрения и биомы (тот, в котором он стоит, и горизонт).
+В сцене есть стены и биомы больше куска (они записываются сразу в несколько кусков).
+Если хоть один шаг разошёлся, выходит с кодом 1.
+Запуск: python -m benchmarks.chunks [--steps 400] [--seed 0] [--chunk-size 32]
+'''
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+
+import chunks
+import game_map
+import interface
+
+STD_STEPS = 400
+STD_CHUNK_SIZE = chunks.STD_CHUNK_SIZE
+#Половина стороны карты.
+MAP_SIZE = 300
+
+def build_scene(seed=0):
+    '''
+    Строит игровую карту с объектами, короткими и длинными стенами и маленькими и большими
+    биомами и возвращает её. Одинаковые seed дают одинаковую карту.
+    '''
+    rand = random.Random(seed)
+    scene = game_map.GameMap()
+    scene.add_object('zombie', (0, 0), True)
+    for i in range(5000):
+        scene.add_object(rand.choice(['zombie', 'tree']),\
+        (rand.uniform(-MAP_SIZE, MAP_SIZE), rand.uniform(-MAP_SIZE, MAP_SIZE)))
+    scene.add_object('sun', (interface.INF, 2 * interface.INF))
+    for i in range(200):
+        length = rand.choice([5, 20, 200])
+        start = (rand.uniform(-MAP_SIZE, MAP_SIZE), rand.uniform(-MAP_SIZE, MAP_SIZE))
+        scene.add_wall(start, (start[0] + rand.uniform(-length, length), start[1] + rand.uniform(-length, length)))
+    scene.add_wall((-100, 5), (100, 6))
+    for i in range(40):
+        scene.add_biom((rand.uniform(-MAP_SIZE, MAP_SIZE), rand.uniform(-MAP_SIZE, MAP_SIZE)),\
+        rand.choice([5, 30, 120]), rand.choice(game_map.Biom.types))
+    scene.add_biom((100, 0), 99, 'desert')
+    return scene
+
+def get_view(scene):
+    '''
+    Возвращает то, что видит наблюдатель на карте scene : GameMap, в виде, который не
+    зависит от индексов объектов: поле зрения (отсортированное) и информацию о биомах.
+    '''
+    sight = sorted(tuple(sorted(elem.items())) for elem in scene.get_sight())
+    return sight, scene.get_biom_info()
+
+def main(steps, seed, chunk_size):
+    full = build_scene(seed)
+    with tempfile.TemporaryDirectory() as path:
+        chunks.save_world(full, path, chunk_size)
+        streamed = game_map.GameMap()
+        streamed.add_object('zombie', full.objects[full.sight].coords, True)
+        streamed.add_object('sun', (interface.INF, 2 * interface.INF))
+        world = chunks.ChunkedWorld(streamed, path, chunk_size)
+        rand = random.Random(seed)
+        differ = 0
+        most_walls = 0
+        most_bioms = 0
+        start = time.perf_counter()
+        for step in range(steps):
+            #В основном вперёд, иногда с поворотом, чтобы наблюдатель ушёл подальше.
+            actions = ['forward'] + rand.sample(game_map.ACTIONS, rand.randint(0, 1))
+            for scene in (full, streamed):
+                for action in actions:
+                    scene.apply_action(action)
+            world.update()
+            if get_view(full) != get_view(streamed):
+                differ += 1
+                print('step {}: streamed map differs at {}'.format(step, full.objects[full.sight].coords),\
+                file=sys.stderr)
+            most_walls = max(most_walls, len(streamed.walls))
+            most_bioms = max(most_bioms, len(streamed.bioms))
+        world.unload_all()
+    print('{} steps in {:.3f} s, ended at {}: {} differ, at most {} of {} walls and {} of {} bioms resident'.format(\
+    steps, time.perf_counter() - start, full.objects[full.sight].coords, differ, most_walls, len(full.walls),\
+    most_bioms, len(full.bioms)), file=sys.stderr)
+    return differ
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Сравнение мира по кускам с картой целиком.')
+    parser.add_argument('--steps', type=int, default=STD_STEPS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=float, default=STD_CHUNK_SIZE)
+    args = parser.parse_args()
+    if main(args.steps, args.seed, args.chunk_size):
+        sys.exit(1)
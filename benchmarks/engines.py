@@ -0,0 +1,96 @@
+'''
+Проверяет, что все движки поля зрения (GameMap.sight_engine: 'incremental', 'index',
+'vector', если есть numpy, и get_sight_batch) дают ровно то же, что и старый способ
+'objects', включая порядок элементов.
+На случайных сценах наблюдатель ходит и поворачивается, а другие объекты тем временем
+ходят, появляются и исчезают (чтобы кэш движка 'incremental' и индекс обновлялись).
+Если хоть в одном тике хоть один движок разошёлся, выходит с кодом 1.
+Запуск: python -m benchmarks.engines [--scenes 40] [--ticks 100] [--seed 0]
+'''
+
+import argparse
+import random
+import sys
+import time
+
+import game_map
+import interface
+
+STD_SCENES = 40
+STD_TICKS = 100
+
+def get_engines():
+    '''
+    Возвращает список движков, которые можно проверить (без 'vector', если нет numpy).
+    '''
+    engines = ['incremental', 'index']
+    if game_map.numpy is not None:
+        engines.append('vector')
+    return engines
+
+def build_scene(rand):
+    '''
+    Строит случайную карту (зомби, деревья, стены, Солнце) генератором rand : random.Random
+    и возвращает её.
+    '''
+    map_size = rand.uniform(5, 60)
+    scene = game_map.GameMap()
+    scene.add_object('zombie', (rand.uniform(-map_size, map_size), rand.uniform(-map_size, map_size)), True)
+    for i in range(rand.randint(0, 1500)):
+        scene.add_object(rand.choice(['zombie', 'tree']),\
+        (rand.uniform(-map_size, map_size), rand.uniform(-map_size, map_size)))
+    scene.add_object('sun', (interface.INF, 2 * interface.INF))
+    for i in range(rand.randint(0, 20)):
+        start = (rand.uniform(-map_size, map_size), rand.uniform(-map_size, map_size))
+        scene.add_wall(start, (start[0] + rand.uniform(-10, 10), start[1] + rand.uniform(-10, 10)))
+    scene.sight_dir = rand.randint(0, 359)
+    return scene
+
+def shake(scene, rand):
+    '''
+    Двигает, убирает и добавляет несколько объектов карты scene (кроме наблюдателя).
+    '''
+    alive = [obj.index for obj in scene.objects if scene.objects.is_alive(obj.index)\
+    and obj.index != scene.sight and not obj.index in scene.unbounded]
+    for obj_index in rand.sample(alive, min(len(alive), 5)):
+        scene.move_obj(rand.uniform(-2, 2), obj_index)
+    if alive and rand.random() < 0.3:
+        scene.remove_object(rand.choice(alive))
+    if rand.random() < 0.3:
+        coords = scene.objects[scene.sight].coords
+        scene.add_object('zombie', (coords[0] + rand.uniform(-10, 10), coords[1] + rand.uniform(-10, 10)))
+
+def main(scenes, ticks, seed):
+    rand = random.Random(seed)
+    engines = get_engines()
+    differ = {engine : 0 for engine in engines + ['batch']}
+    start = time.perf_counter()
+    for scene_number in range(scenes):
+        scene = build_scene(rand)
+        for tick in range(ticks):
+            for action in rand.sample(game_map.ACTIONS, rand.randint(0, 2)):
+                scene.apply_action(action)
+            shake(scene, rand)
+            scene.sight_engine = 'objects'
+            expected = scene.get_sight()
+            for engine in engines:
+                scene.sight_engine = engine
+                if scene.get_sight() != expected:
+                    differ[engine] += 1
+                    print('scene {}, tick {}: {} differs'.format(scene_number, tick, engine), file=sys.stderr)
+            if scene.get_sight_batch([(scene.sight, scene.sight_dir)])[0] != expected:
+                differ['batch'] += 1
+                print('scene {}, tick {}: batch differs'.format(scene_number, tick), file=sys.stderr)
+    print('{} scenes x {} ticks in {:.3f} s, ticks differing from objects: {}'.format(scenes, ticks,\
+    time.perf_counter() - start, ', '.join('{} {}'.format(engine, count) for engine, count in differ.items())),\
+    file=sys.stderr)
+    return sum(differ.values())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Сравнение движков поля зрения со старым способом.')
+    parser.add_argument('--scenes', type=int, default=STD_SCENES)
+    parser.add_argument('--ticks', type=int, default=STD_TICKS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if main(args.scenes, args.ticks, args.seed):
+        sys.exit(1)
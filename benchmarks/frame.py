@@ -0,0 +1,142 @@
+'''
+Замеряет, сколько времени уходит на этапы построения кадра: get_sight, get_biom_info,
+move_obj и полную отрисовку draw_game_map. Окно не нужно: pygame запускается с
+видеодрайвером SDL 'dummy'.
+Сцены синтетические, но воспроизводимые (генератор случайных чисел заводится от seed):
+зомби, деревья, стены через add_wall и биомы через add_biom. Плотность объектов не
+зависит от их количества -- карта растёт вместе со сценой.
+Результат пишется в JSON: для каждого размера сцены и каждого этапа -- перцентили
+времени в миллисекундах (и счётчики кэша картинок и отсечения закрытых объектов, если
+они включены).
+Запуск: python -m benchmarks.frame [--sizes 10 100 1000] [--frames 50] [--output bench_output.json]
+'''
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+import game_map
+import interface
+
+STD_SIZES = [10, 100, 1000, 10000, 100000]
+STD_FRAMES = 50
+STD_OUTPUT = 'bench_output.json'
+PERCENTILES = [50, 90, 99]
+STAGES = ['get_sight', 'get_biom_info', 'move_obj', 'draw_game_map']
+
+def build_scene(objects_number, seed=0):
+    '''
+    Строит игровую карту с objects_number : int объектами (зомби и деревья пополам, плюс
+    стены и биомы) и возвращает её. Одинаковые objects_number и seed дают одинаковую карту.
+    '''
+    rand = random.Random(seed)
+    map_size = 2 * objects_number ** 0.5 + 20
+    scene = game_map.GameMap()
+    scene.add_object('zombie', (0, 0), True)
+    for i in range(objects_number):
+        scene.add_object(rand.choice(['zombie', 'tree']),\
+        (rand.uniform(-map_size, map_size), rand.uniform(-map_size, map_size)))
+    scene.add_object('sun', (interface.INF, 2 * interface.INF))
+    for i in range(objects_number // 100 + 1):
+        start = (rand.uniform(-map_size, map_size), rand.uniform(-map_size, map_size))
+        finish = (start[0] + rand.uniform(-10, 10), start[1] + rand.uniform(-10, 10))
+        scene.add_wall(start, finish)
+    for i in range(objects_number // 200 + 1):
+        scene.add_biom((rand.uniform(-map_size, map_size), rand.uniform(-map_size, map_size)),\
+        rand.uniform(1, map_size / 2), rand.choice(game_map.Biom.types))
+    return scene
+
+def get_stats(times):
+    '''
+    Возвращает словарь с минимумом, максимумом, средним и перцентилями PERCENTILES
+    для списка времён times : [float] (в секундах); сами значения -- в миллисекундах.
+    '''
+    times = sorted(times)
+    stats = {
+        'min' : times[0] * 1000,
+        'max' : times[-1] * 1000,
+        'mean' : sum(times) / len(times) * 1000,
+    }
+    for percentile in PERCENTILES:
+        rank = max(0, min(len(times) - 1, round(percentile / 100 * len(times)) - 1))
+        stats['p' + str(percentile)] = times[rank] * 1000
+    return stats
+
+def measure_scene(scene, screen, pictures, frames):
+    '''
+    Прогоняет frames : int кадров на карте scene : GameMap и возвращает статистику по
+    каждому этапу (см. get_stats). Между кадрами игрок поворачивается и шагает, чтобы
+    поле зрения менялось.
+    '''
+    stages = {name : [] for name in STAGES}
+    visible = []
+    if 'sprite_cache' in pictures:
+        pictures['sprite_cache'].clear()
+        pictures['sprite_cache'].reset_stats()
+    if 'occlusion' in pictures:
+        pictures['occlusion'].reset_stats()
+    for frame in range(frames):
+        scene.sight_dir += 7
+        start = time.perf_counter()
+        objects = scene.get_sight()
+        stages['get_sight'].append(time.perf_counter() - start)
+        visible.append(len(objects))
+        start = time.perf_counter()
+        scene.get_biom_info()
+        stages['get_biom_info'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        scene.move_obj(1 if frame % 2 == 0 else -1)
+        stages['move_obj'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        interface.draw_game_map(screen, scene, pictures)
+        stages['draw_game_map'].append(time.perf_counter() - start)
+    result = {name : get_stats(times) for name, times in stages.items()}
+    result['visible_objects'] = sum(visible) / len(visible)
+    if 'sprite_cache' in pictures:
+        result['sprite_cache'] = pictures['sprite_cache'].get_stats()
+    if 'occlusion' in pictures:
+        result['occlusion'] = pictures['occlusion'].get_stats()
+    return result
+
+def main(sizes, frames, output, seed=0):
+    pygame.init()
+    screen = pygame.display.set_mode((interface.STD_SIZE_Y, interface.STD_SIZE_X))
+    pictures = interface.load_pictures()
+    report = {
+        'meta' : {
+            'python' : platform.python_version(),
+            'pygame' : pygame.version.ver,
+            'numpy' : game_map.numpy.__version__ if game_map.numpy is not None else None,
+            'sight_engine' : game_map.GameMap().sight_engine,
+            'frames' : frames,
+            'seed' : seed,
+            'time' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results' : [],
+    }
+    for size in sizes:
+        scene = build_scene(size, seed)
+        result = measure_scene(scene, screen, pictures, frames)
+        report['results'].append({'objects' : size, 'stages' : result})
+        print('{:>7} objects: '.format(size) + ', '.join('{} p50 {:.3f} ms'.format(name,\
+        stats['p50']) for name, stats in result.items() if name in STAGES), file=sys.stderr)
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=4)
+    pygame.quit()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Замер этапов построения кадра.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=STD_SIZES)
+    parser.add_argument('--frames', type=int, default=STD_FRAMES)
+    parser.add_argument('--output', default=STD_OUTPUT)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    main(args.sizes, args.frames, args.output, args.seed)
@@ -0,0 +1,88 @@
+'''
+Сравнивает, сколько памяти и времени уходит на объекты карты: по-старому (список
+экземпляров класса с __dict__) и в хранилище по столбцам game_object.ObjectStore.
+Запуск: python -m benchmarks.object_store [количество объектов]
+'''
+
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+import game_map
+import game_object
+
+STD_OBJECTS_NUMBER = 100000
+INDEX_CELL_SIZE = game_map.INDEX_CELL_SIZE
+
+class LegacyGameObject:
+    '''
+    Копия старого GameObject (до появления ObjectStore): каждый экземпляр хранит
+    свою копию характеристик из FEATURES в __dict__.
+    '''
+    def __init__(self, name, coords):
+        self.name = name
+        self.coords = coords
+        self.is_visible = game_object.FEATURES[name]['is_visible']
+        self.hp = game_object.FEATURES[name]['hp']
+        self.sight_len = game_object.FEATURES[name]['sight_len']
+        self.resizable = game_object.FEATURES[name]['resizable']
+
+def build_legacy(objects):
+    return [LegacyGameObject(name, (x, y)) for name, x, y in objects]
+
+def build_store(objects):
+    store = game_object.ObjectStore()
+    for name, x, y in objects:
+        store.append(name, (x, y))
+    return store
+
+def build_indexed_store(objects):
+    store = game_object.ObjectStore(INDEX_CELL_SIZE)
+    for name, x, y in objects:
+        store.append(name, (x, y))
+    return store
+
+def measure(build, objects):
+    '''
+    Строит объекты функцией build и возвращает словарь с результатами замеров:
+    память на объект, время построения и время полной сборки мусора.
+    Координаты передаются свежими кортежами, как при вызове GameMap.add_object, так что
+    кортеж, который старый объект держит у себя, тоже попадает в замер.
+    '''
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    built = build(objects)
+    build_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    gc.collect()
+    gc_time = time.perf_counter() - start
+    del built
+    return {
+        'bytes_per_object' : memory / len(objects),
+        'build_time' : build_time,
+        'gc_time' : gc_time,
+    }
+
+def main(objects_number):
+    random.seed(0)
+    objects = []
+    for i in range(objects_number):
+        name = random.choice(['zombie', 'tree', 'wall'])
+        objects.append((name, random.uniform(-100, 100), random.uniform(-100, 100)))
+    results = {
+        'before (list of GameObject)' : measure(build_legacy, objects),
+        'after (ObjectStore)' : measure(build_store, objects),
+        'after (ObjectStore + index)' : measure(build_indexed_store, objects),
+    }
+    print('objects:', objects_number)
+    for name, result in results.items():
+        print('{:30} {:8.1f} bytes/object   build {:.3f} s   gc {:.4f} s'.format(name,\
+        result['bytes_per_object'], result['build_time'], result['gc_time']))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else STD_OBJECTS_NUMBER)
@@ -0,0 +1,222 @@
+'''
+Модуль реализует мир, разбитый на куски (чанки), которые подгружаются с диска, когда
+игрок к ним подходит, и выгружаются обратно, когда он уходит.
+Так мир может быть сколь угодно большим: в памяти держится только то, что рядом с
+игроком (в пределах его sight_len и ещё немного).
+Куски лежат в папке, по файлу на кусок (см. map_format), файл называется по номеру
+куска: "<x>_<y>.chunk".
+Стены и биомы бывают больше куска, поэтому каждая стена и каждый биом записываются во
+все куски, которые задевает их описанный прямоугольник, а на карте держатся, пока
+подгружен хоть один из этих кусков (узнаются они по номеру, см. map_format).
+'''
+
+import math
+import os
+
+import game_object
+import map_format
+
+#Сторона куска по умолчанию.
+STD_CHUNK_SIZE = 32
+#На сколько дальше sight_len подгружать куски (чтобы они успевали загрузиться до того,
+#как игрок их увидит).
+STD_LOAD_MARGIN = 8
+
+def get_chunk(coords, chunk_size):
+    '''
+    Возвращает номер куска (int, int), в который попадает точка coords : (float, float).
+    '''
+    return (math.floor(coords[0] / chunk_size), math.floor(coords[1] / chunk_size))
+
+def get_chunk_path(path, chunk):
+    '''
+    Возвращает путь к файлу куска chunk : (int, int) в папке path : str.
+    '''
+    return os.path.join(path, str(chunk[0]) + '_' + str(chunk[1]) + '.chunk')
+
+def save_world(game_map, path, chunk_size=STD_CHUNK_SIZE):
+    '''
+    Раскладывает содержимое карты game_map : GameMap по кускам со стороной
+    chunk_size : float и записывает их в папку path : str.
+    Тот, от чьего лица ведётся наблюдение, и объекты, которые видны отовсюду (unbounded),
+    в куски не попадают: они живут на карте всегда.
+    Стена и биом попадают во все куски, которые задевает их описанный прямоугольник, под
+    номером, равным их месту в game_map.walls и game_map.bioms.
+    '''
+    os.makedirs(path, exist_ok=True)
+    contents = dict()
+    def get_contents(chunk):
+        if not chunk in contents:
+            contents[chunk] = ([], [], [])
+        return contents[chunk]
+    for obj in game_map.objects:
+        if obj.index == game_map.sight or obj.index in game_map.unbounded\
+        or not game_map.objects.is_alive(obj.index):
+            continue
+        get_contents(get_chunk(obj.coords, chunk_size))[0].append(get_object_record(obj))
+    for wall_id, wall in enumerate(game_map.walls):
+        for chunk in get_chunks_in_box(min(wall.start[0], wall.finish[0]), min(wall.start[1], wall.finish[1]),\
+        max(wall.start[0], wall.finish[0]), max(wall.start[1], wall.finish[1]), chunk_size):
+            get_contents(chunk)[1].append((wall_id, wall))
+    for biom_id, biom in enumerate(game_map.bioms):
+        for chunk in get_chunks_in_box(biom.center[0] - biom.radius, biom.center[1] - biom.radius,\
+        biom.center[0] + biom.radius, biom.center[1] + biom.radius, chunk_size):
+            get_contents(chunk)[2].append((biom_id, biom))
+    for chunk, (objects, walls, bioms) in contents.items():
+        map_format.write_file(get_chunk_path(path, chunk), objects, walls, bioms)
+
+def get_object_record(obj):
+    '''
+    Возвращает запись об объекте obj : GameObject в том виде, в каком её принимает
+    map_format.pack.
+    '''
+    return (obj.name, obj.coords, obj.hp, obj.store.flags[obj.index])
+
+def get_chunks_in_box(left, bottom, right, top, chunk_size):
+    '''
+    Возвращает список кусков, которые задевает прямоугольник от (left, bottom) до
+    (right, top).
+    '''
+    left_chunk, bottom_chunk = get_chunk((left, bottom), chunk_size)
+    right_chunk, top_chunk = get_chunk((right, top), chunk_size)
+    return [(chunk_x, chunk_y) for chunk_x in range(left_chunk, right_chunk + 1)\
+    for chunk_y in range(bottom_chunk, top_chunk + 1)]
+
+class ChunkedWorld:
+    '''
+    Мир из кусков, лежащих на диске, который подгружается в карту game_map по мере того,
+    как по нему ходит тот, от чьего лица ведётся наблюдение.
+    game_map : GameMap -- карта, в которую подгружаются куски.
+    path : str -- папка с файлами кусков (см. save_world).
+    chunk_size : float -- сторона куска.
+    load_margin : float -- на сколько дальше радиуса зрения подгружать куски.
+    loaded : {(int, int) : ([int], [int], [int])} -- подгруженные куски: индексы
+    объектов на карте и номера стен и биомов каждого из них.
+    walls, bioms : {int : (Wall или Biom, set)} -- стены и биомы на карте по номерам, и
+    из каких подгруженных кусков они пришли (общая стена кладётся на карту один раз и
+    убирается, когда выгружен последний её кусок).
+    Состояние общей стены (hp, видимость) записывается в файлы тех её кусков, которые
+    выгружаются, пока она на карте.
+    Вызывать update нужно после каждого перемещения (например, раз в игровой тик).
+    '''
+    def __init__(self, game_map, path, chunk_size=STD_CHUNK_SIZE, load_margin=STD_LOAD_MARGIN):
+        if chunk_size <= 0:
+            raise ValueError('Кусок карты должен быть положительного размера.')
+        self.game_map = game_map
+        self.path = path
+        self.chunk_size = chunk_size
+        self.load_margin = load_margin
+        self.loaded = dict()
+        self.walls = dict()
+        self.bioms = dict()
+
+    def get_needed_chunks(self, radius):
+        '''
+        Возвращает множество кусков, которые пересекаются с кругом радиуса radius : float
+        вокруг того, от чьего лица ведётся наблюдение.
+        '''
+        center = self.game_map.objects[self.game_map.sight].coords
+        left, bottom = get_chunk((center[0] - radius, center[1] - radius), self.chunk_size)
+        right, top = get_chunk((center[0] + radius, center[1] + radius), self.chunk_size)
+        needed = set()
+        for chunk_x in range(left, right + 1):
+            for chunk_y in range(bottom, top + 1):
+                #Ближайшая к центру точка куска.
+                near_x = min(max(center[0], chunk_x * self.chunk_size), (chunk_x + 1) * self.chunk_size)
+                near_y = min(max(center[1], chunk_y * self.chunk_size), (chunk_y + 1) * self.chunk_size)
+                if (near_x - center[0]) ** 2 + (near_y - center[1]) ** 2 <= radius ** 2:
+                    needed.add((chunk_x, chunk_y))
+        return needed
+
+    def update(self):
+        '''
+        Подгружает куски, которые оказались ближе sight_len + load_margin к наблюдателю, и
+        выгружает те, что стали дальше sight_len + load_margin + chunk_size (запас в кусок,
+        чтобы, топчась на границе, не грузить один и тот же кусок туда-обратно).
+        '''
+        sight_len = self.game_map.objects[self.game_map.sight].sight_len
+        radius = sight_len + self.load_margin
+        for chunk in self.get_needed_chunks(radius) - set(self.loaded):
+            self.load(chunk)
+        keep = self.get_needed_chunks(radius + self.chunk_size)
+        for chunk in set(self.loaded) - keep:
+            self.unload(chunk)
+
+    def load(self, chunk):
+        '''
+        Подгружает кусок chunk : (int, int) с диска на карту (если его файла нет, кусок
+        считается пустым).
+        '''
+        chunk_path = get_chunk_path(self.path, chunk)
+        if os.path.exists(chunk_path):
+            objects, walls, bioms = map_format.read_file(chunk_path)
+        else:
+            objects, walls, bioms = [], [], []
+        indexes = []
+        for name, coords, hp, flags in objects:
+            obj_index = self.game_map.add_object(name, coords)
+            self.game_map.objects.hp[obj_index] = hp
+            self.game_map.objects[obj_index].is_visible = flags & game_object.FLAG_VISIBLE
+            indexes.append(obj_index)
+        for wall_id, wall in walls:
+            if not wall_id in self.walls:
+                self.game_map.insert_wall(wall, wall_id)
+                self.walls[wall_id] = (wall, set())
+            self.walls[wall_id][1].add(chunk)
+        for biom_id, biom in bioms:
+            if not biom_id in self.bioms:
+                self.bioms[biom_id] = (self.game_map.add_biom(biom.center, biom.radius, biom.type, biom_id), set())
+            self.bioms[biom_id][1].add(chunk)
+        self.loaded[chunk] = (indexes, [wall_id for wall_id, wall in walls], [biom_id for biom_id, biom in bioms])
+
+    def unload(self, chunk):
+        '''
+        Убирает кусок chunk : (int, int) с карты и записывает его текущее состояние на диск.
+        Объекты, которые успели уйти в другой кусок, достаются ему: если он подгружен --
+        прямо на карте, если нет -- дописываются в его файл. Стены и биомы убираются с
+        карты, только если их не держит другой подгруженный кусок.
+        '''
+        indexes, wall_ids, biom_ids = self.loaded.pop(chunk)
+        records = dict()
+        for obj_index in indexes:
+            obj = self.game_map.objects[obj_index]
+            owner = get_chunk(obj.coords, self.chunk_size)
+            if owner in self.loaded:
+                self.loaded[owner][0].append(obj_index)
+                continue
+            if not owner in records:
+                records[owner] = []
+            records[owner].append(get_object_record(obj))
+            self.game_map.remove_object(obj_index)
+        walls = []
+        for wall_id in wall_ids:
+            wall, owners = self.walls[wall_id]
+            walls.append((wall_id, wall))
+            owners.discard(chunk)
+            if not owners:
+                self.game_map.remove_wall(wall)
+                del self.walls[wall_id]
+        bioms = []
+        for biom_id in biom_ids:
+            biom, owners = self.bioms[biom_id]
+            bioms.append((biom_id, biom))
+            owners.discard(chunk)
+            if not owners:
+                self.game_map.remove_biom(biom)
+                del self.bioms[biom_id]
+        map_format.write_file(get_chunk_path(self.path, chunk), records.pop(chunk, []), walls, bioms)
+        for owner, objects in records.items():
+            owner_path = get_chunk_path(self.path, owner)
+            owner_walls = []
+            owner_bioms = []
+            if os.path.exists(owner_path):
+                old_objects, owner_walls, owner_bioms = map_format.read_file(owner_path)
+                objects = old_objects + objects
+            map_format.write_file(owner_path, objects, owner_walls, owner_bioms)
+
+    def unload_all(self):
+        '''
+        Выгружает все куски (например, перед выходом из игры, чтобы сохранить мир).
+        '''
+        for chunk in list(self.loaded):
+            self.unload(chunk)
@@ -2,13 +2,39 @@
 Модуль содержит реализацию класса игровой карты и методов для работы с ней.
 '''
 
+import angles
 import game_object 
+import sight_cache
+import spatial_index
 import math
 import random
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 PRECISION = 5
-WALL_POINTS_FREQ = 1.5
 EPS = 10 ** -6
+#Запас, с которым векторный движок отсекает объекты по расстоянию и углу (чтобы
+#погрешность numpy не выкинула объект, лежащий ровно на границе поля зрения).
+#Угол -- в градусах, поэтому запас больше половины шага округления в degree.
+SIGHT_CULL_EPS = 10 ** -5
+#Сторона клетки пространственного индекса объектов.
+INDEX_CELL_SIZE = 4
+#Сторона клетки индекса биомов.
+BIOM_CELL_SIZE = 16
+#Сторона клетки индекса стен.
+WALL_CELL_SIZE = 16
+#Сторона клетки, внутри которой горизонт (см. GameMap.get_horizon) считается одинаковым.
+HORIZON_CELL_SIZE = 4
+#Сколько делений таблиц синусов и косинусов (см. angles) приходится на градус.
+ANGLE_RESOLUTION = angles.STD_RESOLUTION
+
+#Таблица для поля зрения и горизонта.
+ANGLES = angles.AngleTable(ANGLE_RESOLUTION)
+#Таблица для шагов (угол в радианах округляется до PRECISION, как было в move_obj).
+MOVE_ANGLES = angles.AngleTable(ANGLE_RESOLUTION, PRECISION)
 
 class Biom:
     '''
@@ -43,11 +69,27 @@ class Biom:
         При условии, что координата coords : (float, float) принадлежит биому,
         возвращает истину.
         '''
-        dist_to_point = get_dist_between_points(self.center, coords)
-        if dist_to_point <= self.radius:
-            return True
-        else:
-            return False
+        return (self.center[0] - coords[0]) ** 2 + (self.center[1] - coords[1]) ** 2 <= self.radius ** 2
+
+class Wall:
+    '''
+    Класс стены.
+    Стена -- это отрезок на карте; в поле зрения она попадает целиком, одним куском
+    (см. GameMap.get_sight), так что сколько она стоит, от её длины не зависит.
+    start : (float, float) -- координаты начала стены.
+    finish : (float, float) -- координаты конца стены.
+    name : str -- название объекта (чтобы брать характеристики и картинку стены).
+    is_visible : bool -- истина, если стена отображается.
+    hp : int -- прочность стены.
+    '''
+    def __init__(self, start, finish):
+        if get_dist_between_points(start, finish) < EPS:
+            raise ValueError('Стена нулевой длины? Это не стена, это столб. Давай нормальные концы.')
+        self.start = start
+        self.finish = finish
+        self.name = 'wall'
+        self.is_visible = game_object.FEATURES[self.name]['is_visible']
+        self.hp = game_object.FEATURES[self.name]['hp']
 
 def get_point_on_circle_by_angle(center, radius, angle):
     '''
@@ -68,26 +110,227 @@ def get_dist_between_points(one_point, other_point):
     y2 = other_point[1]
     return ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5 
 
+def clip_segment_to_sector(start, finish, center, radius, left_angle, right_angle):
+    '''
+    Обрезает отрезок от start : (float, float) до finish : (float, float) по сектору круга
+    с центром center : (float, float) и радиусом radius : float, который идёт против
+    часовой стрелки от угла left_angle : float до угла right_angle : float (в градусах).
+    Угол сектора должен быть меньше 180 градусов (тогда сектор выпуклый, и от отрезка
+    остаётся не больше одного куска).
+    Возвращает концы оставшегося куска ((float, float), (float, float)) в том же порядке,
+    что и у исходного отрезка, или None, если в сектор отрезок не попадает.
+    '''
+    start_x = start[0] - center[0]
+    start_y = start[1] - center[1]
+    dir_x = finish[0] - start[0]
+    dir_y = finish[1] - start[1]
+    #Точка отрезка: (start_x + t * dir_x, start_y + t * dir_y), где t от 0 до 1.
+    #Каждое условие "точка внутри сектора" оставляет от t отрезок [t_begin, t_end].
+    t_begin = 0
+    t_end = 1
+    left_x = ANGLES.cos(left_angle)
+    left_y = ANGLES.sin(left_angle)
+    right_x = ANGLES.cos(right_angle)
+    right_y = ANGLES.sin(right_angle)
+    #Точка должна лежать левее (против часовой) левой стороны сектора и правее правой:
+    #free + t * slope >= 0 для каждой стороны.
+    for free, slope in ((left_x * start_y - left_y * start_x, left_x * dir_y - left_y * dir_x),\
+    (start_x * right_y - start_y * right_x, dir_x * right_y - dir_y * right_x)):
+        if abs(slope) < EPS:
+            if free < 0:
+                return None
+        elif slope > 0:
+            t_begin = max(t_begin, -free / slope)
+        else:
+            t_end = min(t_end, -free / slope)
+    #И внутри круга: |точка| ** 2 <= radius ** 2 -- квадратное неравенство относительно t.
+    square_a = dir_x ** 2 + dir_y ** 2
+    half_b = start_x * dir_x + start_y * dir_y
+    square_c = start_x ** 2 + start_y ** 2 - radius ** 2
+    discriminant = half_b ** 2 - square_a * square_c
+    if discriminant < 0:
+        return None
+    t_begin = max(t_begin, (-half_b - discriminant ** 0.5) / square_a)
+    t_end = min(t_end, (-half_b + discriminant ** 0.5) / square_a)
+    if t_end - t_begin < EPS:
+        return None
+    return ((start[0] + t_begin * dir_x, start[1] + t_begin * dir_y),\
+    (start[0] + t_end * dir_x, start[1] + t_end * dir_y))
+
 def degree(value):
     '''
     Приводит значение к промежутку от 0 до 360.
     '''
+    if type(value) is int:
+        #Целые углы (а таких почти все) округлять незачем.
+        if value < 0:
+            value += 360
+        if value > 360:
+            value %= 360
+        return value
     if (value < 0):
         value += 360
     if (value > 360):
         value %= 360
     return round(value, PRECISION)
 
+def get_sight_elem(sight_coords, sight_len, name, obj_coords, resizable, left_side_of_vision,\
+right_side_of_vision):
+    '''
+    Возвращает элемент поля зрения (см. GameMap.get_sight_by_objects) для объекта
+    name : str, стоящего в точке obj_coords : (float, float), если смотреть из точки
+    sight_coords : (float, float) с радиусом зрения sight_len : float, а поле зрения идёт
+    от left_side_of_vision : float до right_side_of_vision : float градусов. resizable : bool --
+    уменьшается ли объект с расстоянием. Если объект в поле зрения не попадает,
+    возвращает None.
+    '''
+    dist_to_obj = get_dist_between_points(sight_coords, obj_coords)
+    if dist_to_obj > sight_len and resizable:
+        return None
+    elem = dict()
+    elem['prior'] = dist_to_obj
+    elem['name'] = name
+    if resizable:
+        elem['dist'] = 1 - (dist_to_obj / sight_len)
+    else:
+        elem['dist'] = 1
+    obj_x = obj_coords[0] - sight_coords[0]
+    obj_y = obj_coords[1] - sight_coords[1]
+    polar_angle = math.atan2(obj_y, obj_x)
+    polar_angle = degree(polar_angle * 180 / math.pi)
+    if not left_side_of_vision <= polar_angle <= right_side_of_vision and not\
+    degree(left_side_of_vision + 90) <= degree(polar_angle + 90) <= degree(right_side_of_vision + 90):
+        return None
+    if left_side_of_vision < right_side_of_vision:
+        elem['move'] = (polar_angle - left_side_of_vision) / (right_side_of_vision - left_side_of_vision)
+    else:
+        elem['move'] = (degree(polar_angle + 90) - degree(left_side_of_vision + 90)) / (degree(right_side_of_vision + 90) - degree(left_side_of_vision + 90))
+    return elem
+
+def get_wall_elem(wall, sight_coords, sight_len, sight_dir):
+    '''
+    Возвращает кусок стены wall : Wall, который видно из точки sight_coords : (float, float)
+    с радиусом зрения sight_len : float при направлении взгляда sight_dir : float
+    (формат см. в GameMap.get_walls_in_sight), или None, если стену оттуда не видно.
+    '''
+    vision_angle = 2 * GameMap.HALF_OF_VISION_ANGLE
+    left_side_of_vision = sight_dir - GameMap.HALF_OF_VISION_ANGLE
+    right_side_of_vision = sight_dir + GameMap.HALF_OF_VISION_ANGLE
+    part = clip_segment_to_sector(wall.start, wall.finish, sight_coords, sight_len,\
+    left_side_of_vision, right_side_of_vision)
+    if part is None:
+        return None
+    ends = []
+    for point in part:
+        polar_angle = math.atan2(point[1] - sight_coords[1], point[0] - sight_coords[0])
+        polar_angle = (polar_angle * 180 / math.pi - left_side_of_vision) % 360
+        if polar_angle > (360 + vision_angle) / 2:
+            #Конец лежит на левой стороне сектора, а погрешность увела его за 360.
+            polar_angle = 0
+        move = min(polar_angle, vision_angle) / vision_angle
+        dist = 1 - get_dist_between_points(sight_coords, point) / sight_len
+        ends.append((move, dist))
+    ends.sort()
+    elem = dict()
+    middle = ((part[0][0] + part[1][0]) / 2, (part[0][1] + part[1][1]) / 2)
+    elem['prior'] = get_dist_between_points(sight_coords, middle)
+    elem['name'] = wall.name
+    elem['dist'] = ends[0][1]
+    elem['move'] = ends[0][0]
+    elem['dist_end'] = ends[1][1]
+    elem['move_end'] = ends[1][0]
+    return elem
+
+def get_observers_sight(task):
+    '''
+    Считает поле зрения для группы наблюдателей, которым хватает общего списка кандидатов
+    (см. GameMap.get_sight_batch). Функция ничего не знает о карте, поэтому её можно
+    запускать в другом процессе.
+    task : ([(int, (float, float), float, float)], [(int, str, (float, float), bool)], [Wall]) --
+    наблюдатели (индекс, координаты, радиус зрения, направление взгляда), кандидаты
+    (индекс, название, координаты, resizable) и стены.
+    Сначала для каждого наблюдателя кандидаты грубо отсеиваются по расстоянию и углу (с
+    запасом SIGHT_CULL_EPS, пачкой на numpy, если он есть), а прошедшие отсев проверяются
+    точно, через get_sight_elem.
+    Возвращает список полей зрения (в формате GameMap.get_sight) в порядке наблюдателей.
+    '''
+    observers, candidates, walls = task
+    vision_angle = 2 * GameMap.HALF_OF_VISION_ANGLE
+    if numpy is not None:
+        candidates_x = numpy.array([candidate[2][0] for candidate in candidates], dtype=numpy.float64)
+        candidates_y = numpy.array([candidate[2][1] for candidate in candidates], dtype=numpy.float64)
+        resizable = numpy.array([candidate[3] for candidate in candidates], dtype=bool)
+    sights = []
+    for obs_index, sight_coords, sight_len, sight_dir in observers:
+        sight_dir = degree(sight_dir)
+        left_side_of_vision = degree(sight_dir - GameMap.HALF_OF_VISION_ANGLE)
+        right_side_of_vision = degree(sight_dir + GameMap.HALF_OF_VISION_ANGLE)
+        max_dist = sight_len * (1 + SIGHT_CULL_EPS) + SIGHT_CULL_EPS
+        if numpy is not None:
+            obj_x = candidates_x - sight_coords[0]
+            obj_y = candidates_y - sight_coords[1]
+            in_sight = ~resizable | (obj_x * obj_x + obj_y * obj_y <= max_dist * max_dist)
+            in_sight &= ANGLES.get_cone_mask(obj_x, obj_y, left_side_of_vision, right_side_of_vision,\
+            SIGHT_CULL_EPS, vision_angle)
+            survivors = [candidates[i] for i in numpy.flatnonzero(in_sight).tolist()]
+        else:
+            obj_x = [candidate[2][0] - sight_coords[0] for candidate in candidates]
+            obj_y = [candidate[2][1] - sight_coords[1] for candidate in candidates]
+            in_cone = ANGLES.get_cone_mask(obj_x, obj_y, left_side_of_vision, right_side_of_vision,\
+            SIGHT_CULL_EPS, vision_angle)
+            survivors = [candidate for candidate, x, y, ok in zip(candidates, obj_x, obj_y, in_cone)\
+            if ok and (not candidate[3] or x * x + y * y <= max_dist * max_dist)]
+        objects_in_sight = []
+        for obj_index, name, obj_coords, obj_resizable in survivors:
+            if obj_index != obs_index:
+                elem = get_sight_elem(sight_coords, sight_len, name, obj_coords, obj_resizable,\
+                left_side_of_vision, right_side_of_vision)
+                if elem is not None:
+                    objects_in_sight.append(elem)
+        for wall in walls:
+            elem = get_wall_elem(wall, sight_coords, sight_len, sight_dir)
+            if elem is not None:
+                objects_in_sight.append(elem)
+        sights.append(objects_in_sight)
+    return sights
+
+#Действия, которые может совершать игрок (см. GameMap.apply_action).
+ACTIONS = ['turn_left', 'turn_right', 'forward', 'back', 'flip']
+
 class GameMap:
     '''
     Класс для обработки игровой карты и событий, происходящих на ней.
     Карта представляет собой ось декартовых координат, на которой расположены объекты.
-    objects : [GameObject] -- список всех объектов, находящихся на карте.
+    objects : game_object.ObjectStore -- все объекты, находящиеся на карте (ведёт себя как
+    список GameObject).
     sight : int -- индекс объекта, от лица которого ведётся наблюдение (пока работает так,
     чтобы проверить корректность работы поля зрения ото всех элементов).
     sight_dir : int -- направление взгляда (как на окружности из тригонометрии:
     вверх -- 90 градусов).
-    bioms : [Biom] -- массив биомов на карте. 
+    bioms : [Biom] -- массив биомов на карте (добавлять и убирать их нужно через add_biom
+    и remove_biom, чтобы не разъехался индекс). 
+    biom_index : spatial_index.CircleGrid -- индекс биомов для get_biom_at.
+    biom_order : {Biom : int} -- порядковый номер добавления каждого биома (при наложении
+    побеждает более поздний, как и раньше, когда биомы перебирались по порядку).
+    horizon, horizon_key -- кэш get_horizon и клетка (с sight_len), для которой он посчитан.
+    walls : [Wall] -- массив стен на карте (добавлять и убирать их нужно через add_wall и
+    remove_wall, как и биомы).
+    wall_index : spatial_index.SegmentGrid -- индекс стен для get_walls_in_radius.
+    wall_order : {Wall : int} -- порядковый номер добавления каждой стены (найденные
+    индексом стены выдаются по порядку этих номеров, то есть так же, как лежат в walls,
+    если номера не задавались явно).
+    sight_engine : str -- чем считать поле зрения: 'incremental' -- через кэш полярных
+    углов объектов вокруг игрока (sight_cache), который при поворотах не пересчитывается,
+    'index' -- перебирая только то, что
+    пространственный индекс нашёл рядом с игроком, 'vector' -- всю карту пачкой на numpy
+    (если он установлен), 'objects' -- старым способом, по объекту за раз (оставлен для
+    сравнения).
+    index : spatial_index.UniformGrid -- пространственный индекс объектов (хранит их индексы
+    в objects, поддерживается самим objects).
+    unbounded : [int] -- индексы объектов, которые не уменьшаются с расстоянием (resizable
+    ложно, как у Солнца). Они видны с любого расстояния, поэтому в индекс не кладутся, а
+    проверяются всегда.
+    sight_cache : sight_cache.SightCache -- кэш для движка 'incremental'.
     '''
 
     #Константа, определяющая размер поля зрения игрока.
@@ -97,21 +340,253 @@ class GameMap:
 
     
     def __init__ (self):
-        self.objects = []
+        self.objects = game_object.ObjectStore(INDEX_CELL_SIZE)
         self.sight = None
         self.sight_dir = 90
         self.bioms = []
+        self.biom_index = spatial_index.CircleGrid(BIOM_CELL_SIZE)
+        self.biom_order = dict()
+        self.bioms_added = 0
+        self.horizon = None
+        self.horizon_key = None
+        self.walls = []
+        self.wall_index = spatial_index.SegmentGrid(WALL_CELL_SIZE)
+        self.wall_order = dict()
+        self.walls_added = 0
+        self.sight_engine = 'incremental'
+        self.index = self.objects.index
+        self.unbounded = self.objects.unbounded
+        self.sight_cache = sight_cache.SightCache(self)
 
     def add_object(self, name, coords, sight=False):
         '''
         Добавляет на игровую карту, в точку coords : (int, int) объект name : str.
         Если sight : bool истинно, то наблюдение ведётся от лица данного объекта.
+        Возвращает индекс (int) нового объекта.
         '''
-        self.objects.append(game_object.GameObject(name, coords))
+        obj = game_object.GameObject(name, coords, self.objects)
         if sight:
-            self.sight = len(self.objects) - 1
+            self.sight = obj.index
+        return obj.index
+
+    def remove_object(self, obj_index):
+        '''
+        Убирает с карты объект под индексом obj_index : int. Индексы остальных объектов
+        не меняются, а освободившийся индекс достанется следующему добавленному объекту.
+        '''
+        if obj_index == self.sight:
+            raise ValueError('Убрать с карты того, чьими глазами смотрим? Так не пойдёт.')
+        self.objects.remove(obj_index)
+
+    def get_objects_in_radius(self, center, radius):
+        '''
+        Возвращает отсортированный список индексов объектов, которые лежат не дальше
+        radius : float от точки center : (float, float). Объекты из unbounded не
+        учитываются.
+        '''
+        return sorted(self.index.query_radius(center, radius))
+
+    def get_objects_in_wedge(self, center, radius, left_angle, right_angle, eps=0):
+        '''
+        Возвращает отсортированный список индексов объектов, которые лежат не дальше
+        radius : float от точки center : (float, float) и внутри угла от left_angle : float
+        до right_angle : float (в градусах, против часовой стрелки). Угол расширяется на
+        eps : float градусов с каждой стороны. Объекты из unbounded не учитываются.
+        '''
+        return sorted(self.index.query_wedge(center, radius, left_angle, right_angle, eps))
+
+    def get_sight(self, structured=False, pose=None):
+        '''
+        Возвращает поле зрения (формат см. в get_sight_by_objects), посчитанное движком
+        sight_engine.
+        Если structured : bool истинно, то вместо списка словарей возвращается
+        структурированный массив numpy с полями index, name, dist, move, prior, dist_end и
+        move_end (только для движка 'vector'). У стен index равен -1, у остальных объектов
+        dist_end и move_end совпадают с dist и move.
+        pose : ((float, float), float) -- если задано, смотреть из этой точки и в этом
+        направлении, а не оттуда, где стоит sight, и не туда, куда указывает sight_dir
+        (например, из промежуточного положения между тиками). Карта при этом не меняется,
+        а считает такое поле зрения движок 'index' (кэш 'incremental' построен вокруг
+        настоящих координат).
+        '''
+        if pose is not None:
+            if structured:
+                raise ValueError('Структурированный массив умеет возвращать только движок vector.')
+            return self.get_sight_by_index(pose)
+        if self.sight_engine == 'vector':
+            return self.get_sight_vectorized(structured)
+        if structured:
+            raise ValueError('Структурированный массив умеет возвращать только движок vector.')
+        if self.sight_engine == 'incremental':
+            return self.get_sight_incremental()
+        if self.sight_engine == 'index':
+            return self.get_sight_by_index()
+        return self.get_sight_by_objects()
+
+    def get_sight_incremental(self):
+        '''
+        Считает то же самое, что и get_sight_by_objects, но кандидатов берёт из sight_cache:
+        там объекты рядом с игроком уже отсортированы по полярному углу, так что при
+        повороте на месте стоимость зависит только от того, сколько объектов в конусе
+        зрения. Шаг самого игрока перестраивает кэш, а шаги других объектов только
+        переставляют их в кэше.
+        '''
+        self.sight_dir = degree(self.sight_dir)
+        left_side_of_vision = degree(self.sight_dir - GameMap.HALF_OF_VISION_ANGLE)
+        right_side_of_vision = degree(self.sight_dir + GameMap.HALF_OF_VISION_ANGLE)
+        sighter = self.objects[self.sight]
+        max_dist = sighter.sight_len * (1 + SIGHT_CULL_EPS) + SIGHT_CULL_EPS
+        candidates = self.sight_cache.query(max_dist, left_side_of_vision,\
+        2 * GameMap.HALF_OF_VISION_ANGLE, SIGHT_CULL_EPS)
+        objects_in_sight = []
+        for obj_index in sorted(candidates + self.unbounded):
+            elem = self._get_sight_elem(obj_index, left_side_of_vision, right_side_of_vision)
+            if elem is not None:
+                objects_in_sight.append(elem)
+        return objects_in_sight + self.get_walls_in_sight()
+
+    def get_sight_by_index(self, pose=None):
+        '''
+        Считает то же самое, что и get_sight_by_objects, но проверяет только объекты из
+        unbounded и те, что пространственный индекс нашёл в секторе обзора (с запасом
+        SIGHT_CULL_EPS). Время работы зависит от того, сколько объектов рядом с игроком, а
+        не от размера всей карты.
+        pose -- см. get_sight.
+        '''
+        if pose is None:
+            self.sight_dir = degree(self.sight_dir)
+            coords = self.objects[self.sight].coords
+            sight_dir = self.sight_dir
+        else:
+            coords = pose[0]
+            sight_dir = degree(pose[1])
+        left_side_of_vision = degree(sight_dir - GameMap.HALF_OF_VISION_ANGLE)
+        right_side_of_vision = degree(sight_dir + GameMap.HALF_OF_VISION_ANGLE)
+        sighter = self.objects[self.sight]
+        max_dist = sighter.sight_len * (1 + SIGHT_CULL_EPS) + SIGHT_CULL_EPS
+        if 2 * GameMap.HALF_OF_VISION_ANGLE < 360:
+            candidates = self.index.query_wedge(coords, max_dist, left_side_of_vision,\
+            right_side_of_vision, SIGHT_CULL_EPS, ANGLES)
+        else:
+            candidates = self.index.query_radius(coords, max_dist)
+        objects_in_sight = []
+        for obj_index in sorted(candidates + self.unbounded):
+            elem = self._get_sight_elem(obj_index, left_side_of_vision, right_side_of_vision,\
+            coords=coords)
+            if elem is not None:
+                objects_in_sight.append(elem)
+        return objects_in_sight + self.get_walls_in_sight(sight_dir=sight_dir, coords=coords)
+
+    def get_sight_vectorized(self, structured=False):
+        '''
+        Считает то же самое, что и get_sight_by_objects, но отсев делает для всех объектов
+        разом: расстояния, полярные углы и попадание в конус зрения получаются операциями
+        над массивами координат, без цикла на питоне.
+        Отсев по расстоянию и сторонам конуса (векторными произведениями, см.
+        angles.AngleTable.get_cone_mask) может разойтись с ** 0.5 и math.atan2 в последнем бите,
+        поэтому отсев идёт с запасом SIGHT_CULL_EPS, а dist, move и prior для прошедших
+        его объектов досчитываются _get_sight_elem. Так результат совпадает с
+        get_sight_by_objects один в один (включая порядок объектов), а на питоне
+        обрабатываются только те объекты, что видны (или лежат на самой границе видимости).
+        '''
+        if numpy is None:
+            raise ValueError('Без numpy векторный движок не поедет, ставь numpy.')
+        self.sight_dir = degree(self.sight_dir)
+        left_side_of_vision = degree(self.sight_dir - GameMap.HALF_OF_VISION_ANGLE)
+        right_side_of_vision = degree(self.sight_dir + GameMap.HALF_OF_VISION_ANGLE)
+        sighter = self.objects[self.sight]
+        obj_x = numpy.frombuffer(self.objects.xs, dtype=numpy.float64) - sighter.coords[0]
+        obj_y = numpy.frombuffer(self.objects.ys, dtype=numpy.float64) - sighter.coords[1]
+        flags = numpy.frombuffer(self.objects.flags, dtype=numpy.uint8)
+        in_sight = (flags & game_object.FLAG_VISIBLE) != 0
+        in_sight[self.sight] = False
+        resizable = (flags & game_object.FLAG_RESIZABLE) != 0
+        max_dist = sighter.sight_len * (1 + SIGHT_CULL_EPS) + SIGHT_CULL_EPS
+        dist = obj_x * obj_x + obj_y * obj_y
+        in_sight &= ~resizable | (dist <= max_dist * max_dist)
+        in_sight &= ANGLES.get_cone_mask(obj_x, obj_y, left_side_of_vision, right_side_of_vision,\
+        SIGHT_CULL_EPS, 2 * GameMap.HALF_OF_VISION_ANGLE)
+        indexes = []
+        objects_in_sight = []
+        for i in numpy.flatnonzero(in_sight).tolist():
+            elem = self._get_sight_elem(i, left_side_of_vision, right_side_of_vision)
+            if elem is not None:
+                indexes.append(i)
+                objects_in_sight.append(elem)
+        walls_in_sight = self.get_walls_in_sight()
+        if not structured:
+            return objects_in_sight + walls_in_sight
+        rez = numpy.zeros(len(objects_in_sight) + len(walls_in_sight), dtype=[
+            ('index', numpy.int64),
+            ('name', 'U' + str(max(map(len, game_object.FEATURES)))),
+            ('dist', numpy.float64),
+            ('move', numpy.float64),
+            ('prior', numpy.float64),
+            ('dist_end', numpy.float64),
+            ('move_end', numpy.float64),
+        ])
+        rez['index'] = indexes + [-1] * len(walls_in_sight)
+        objects_in_sight += walls_in_sight
+        for field in ('name', 'dist', 'move', 'prior'):
+            rez[field] = [elem[field] for elem in objects_in_sight]
+        rez['dist_end'] = [elem.get('dist_end', elem['dist']) for elem in objects_in_sight]
+        rez['move_end'] = [elem.get('move_end', elem['move']) for elem in objects_in_sight]
+        return rez
+
+    def get_sight_batch(self, observers, executor=None):
+        '''
+        Считает поле зрения сразу для многих наблюдателей (например, для всех зомби).
+        observers : [(int, float)] -- пары (индекс объекта, направление его взгляда).
+        Возвращает список полей зрения в порядке observers; каждое -- в том же формате,
+        что и get_sight, и совпадает с тем, что вернул бы get_sight, если бы наблюдение
+        велось от лица этого объекта.
+        Наблюдатели группируются по клеткам пространственного индекса: для каждой клетки
+        индексы объектов и стен опрашиваются один раз, и найденные кандидаты и стены
+        делятся на всех, кто в ней стоит.
+        executor : concurrent.futures.Executor -- если задан, группы считаются параллельно
+        на нём. Пул создаёт и закрывает вызывающий, так что один пул служит всем кадрам, а
+        не поднимается заново на каждый вызов. ProcessPoolExecutor помогает на очень
+        больших ордах, когда сама работа перевешивает пересылку данных.
+        '''
+        groups = dict()
+        for position, observer in enumerate(observers):
+            obs = self.objects[observer[0]]
+            if obs.sight_len is None:
+                raise ValueError('Объект ' + obs.name + ' ничего не видит, у него нет sight_len.')
+            cell = self.index.get_cell(obs.coords)
+            if not cell in groups:
+                groups[cell] = []
+            groups[cell].append(position)
+        cell_size = self.index.cell_size
+        positions = []
+        tasks = []
+        for cell, group in groups.items():
+            cell_center = ((cell[0] + 0.5) * cell_size, (cell[1] + 0.5) * cell_size)
+            max_dist = max(self.objects[observers[position][0]].sight_len for position in group)
+            radius = max_dist * (1 + SIGHT_CULL_EPS) + SIGHT_CULL_EPS + cell_size * 2 ** 0.5 / 2
+            candidates = []
+            for obj_index in sorted(self.index.query_radius(cell_center, radius) + self.unbounded):
+                obj = self.objects[obj_index]
+                if obj.is_visible:
+                    candidates.append((obj_index, obj.name, obj.coords, obj.resizable))
+            group_observers = []
+            for position in group:
+                obs = self.objects[observers[position][0]]
+                group_observers.append((observers[position][0], obs.coords, obs.sight_len,\
+                observers[position][1]))
+            positions.append(group)
+            tasks.append((group_observers, candidates, self.get_walls_in_radius(cell_center, radius)))
+        if executor is None:
+            results = map(get_observers_sight, tasks)
+        else:
+            results = executor.map(get_observers_sight, tasks)
+        sights = [None] * len(observers)
+        for group, group_sights in zip(positions, results):
+            for position, sight in zip(group, group_sights):
+                sights[position] = sight
+        return sights
 
-    def get_sight(self):
+    def get_sight_by_objects(self):
         '''
         Возвращает поле зрения, содержащее попавшие в него объекты,  в
         следующем формате:
@@ -126,61 +601,119 @@ class GameMap:
                 приоритетом).
             }
         ]
+        После объектов идут попавшие в поле зрения стены (см. get_walls_in_sight).
         '''
         self.sight_dir = degree(self.sight_dir)
         left_side_of_vision = degree(self.sight_dir - GameMap.HALF_OF_VISION_ANGLE)
         right_side_of_vision = degree(self.sight_dir + GameMap.HALF_OF_VISION_ANGLE)
         objects_in_sight = []
-        for obj in enumerate(self.objects):
-            if obj[0] == self.sight:
-                continue
-            if not obj[1].is_visible:
-                continue
-            if get_dist_between_points(self.objects[self.sight].coords, obj[1].coords)\
-            > self.objects[self.sight].sight_len and obj[1].resizable:
-                continue
-            elem = dict()
-            elem['prior'] = get_dist_between_points(self.objects[self.sight].coords, obj[1].coords)
-            elem['name'] = obj[1].name
-            if obj[1].resizable:
-                elem['dist'] = 1 - (get_dist_between_points(self.objects[self.sight].coords, obj[1].coords)\
-                / self.objects[self.sight].sight_len)
-            else:
-                elem['dist'] = 1
-            obj_x = obj[1].coords[0]
-            obj_y = obj[1].coords[1]
-            sight_x = self.objects[self.sight].coords[0]
-            sight_y = self.objects[self.sight].coords[1]
-            obj_x -= sight_x
-            obj_y -= sight_y
-            polar_angle = math.atan2(obj_y, obj_x)
-            polar_angle = degree(polar_angle * 180 / math.pi)
-            if not left_side_of_vision <= polar_angle <= right_side_of_vision and not\
-            degree(left_side_of_vision + 90) <= degree(polar_angle + 90) <= degree(right_side_of_vision + 90):
-                continue
-            if left_side_of_vision < right_side_of_vision:
-                elem['move'] = (polar_angle - left_side_of_vision) / (right_side_of_vision - left_side_of_vision)
-            else:
-                elem['move'] = (degree(polar_angle + 90) - degree(left_side_of_vision + 90)) / (degree(right_side_of_vision + 90) - degree(left_side_of_vision + 90))
-            objects_in_sight.append(elem)
-        return objects_in_sight
+        for obj_index in range(len(self.objects)):
+            elem = self._get_sight_elem(obj_index, left_side_of_vision, right_side_of_vision)
+            if elem is not None:
+                objects_in_sight.append(elem)
+        return objects_in_sight + self.get_walls_in_sight()
+
+    def get_walls_in_sight(self, sight=None, sight_dir=None, coords=None):
+        '''
+        Возвращает попавшие в поле зрения стены. Каждая стена обрезается по сектору обзора
+        (радиус -- sight_len того, от чьего лица ведётся наблюдение) и даёт ровно один кусок
+        в таком формате:
+        {
+            'name' : str -- название объекта стены.
+            'dist' : float -- расстояние до левого (на экране) конца куска (в процентах,
+            как у обычных объектов).
+            'move' : float -- смещение левого конца куска от левого края поля зрения.
+            'dist_end' : float -- расстояние до правого конца куска.
+            'move_end' : float -- смещение правого конца куска.
+            'prior' : float -- приоритет вывода (расстояние до середины куска).
+        }
+        Угол обзора (2 * HALF_OF_VISION_ANGLE) должен быть меньше 180 градусов.
+        sight : int и sight_dir : float -- от чьего лица и куда смотреть (по умолчанию --
+        self.sight и self.sight_dir), coords : (float, float) -- откуда (по умолчанию --
+        оттуда, где стоит sight).
+        '''
+        if sight is None:
+            sight = self.sight
+        if sight_dir is None:
+            sight_dir = self.sight_dir
+        sighter = self.objects[sight]
+        if coords is None:
+            coords = sighter.coords
+        walls_in_sight = []
+        for wall in self.get_walls_in_radius(coords,\
+        sighter.sight_len * (1 + SIGHT_CULL_EPS) + SIGHT_CULL_EPS):
+            elem = get_wall_elem(wall, coords, sighter.sight_len, sight_dir)
+            if elem is not None:
+                walls_in_sight.append(elem)
+        return walls_in_sight
+
+    def get_walls_in_radius(self, center, radius):
+        '''
+        Возвращает видимые стены (по порядку wall_order), которые проходят не
+        дальше radius : float от точки center : (float, float). Перебираются только стены
+        из клеток индекса, которые задевает круг.
+        '''
+        walls = [wall for wall in self.wall_index.query_radius(center, radius) if wall.is_visible]
+        walls.sort(key=self.wall_order.get)
+        return walls
+
+    def _get_sight_elem(self, obj_index, left_side_of_vision, right_side_of_vision, sight=None,\
+    coords=None):
+        '''
+        Возвращает элемент поля зрения (см. get_sight_by_objects) для объекта под индексом
+        obj_index : int или None, если объект в поле зрения не попадает.
+        sight : int -- от чьего лица смотреть (по умолчанию -- self.sight).
+        coords : (float, float) -- откуда смотреть (по умолчанию -- оттуда, где стоит sight).
+        '''
+        if sight is None:
+            sight = self.sight
+        if obj_index == sight:
+            return None
+        obj = self.objects[obj_index]
+        if not obj.is_visible:
+            return None
+        sighter = self.objects[sight]
+        if coords is None:
+            coords = sighter.coords
+        return get_sight_elem(coords, sighter.sight_len, obj.name, obj.coords, obj.resizable,\
+        left_side_of_vision, right_side_of_vision)
 
     def move_obj(self, way, obj_index=None):
         '''
         Перемещает объект под индексом obj_index : int на расстояние way : float.
         Перемещает в том направлении, куда смотрит объект (просто шаг вперёд).
         '''
-        sight_angle = round(self.sight_dir * math.pi / 180, PRECISION)
         if obj_index is None:
             obj_index = self.sight
         obj = self.objects[obj_index]
         x = obj.coords[0]
         y = obj.coords[1]
-        x = x + round(way * math.cos(sight_angle), PRECISION)
-        y = y + round(way * math.sin(sight_angle), PRECISION)
+        x = x + round(way * MOVE_ANGLES.cos(self.sight_dir), PRECISION)
+        y = y + round(way * MOVE_ANGLES.sin(self.sight_dir), PRECISION)
         self.objects[obj_index].coords = (x, y)
 
-    def get_data_of_sighter(self):
+    def apply_action(self, action):
+        '''
+        Выполняет действие action : str (одно из ACTIONS) за того, от чьего лица ведётся
+        наблюдение: поворот на градус влево или вправо, шаг вперёд или назад, разворот.
+        После поворота sight_dir приводится к промежутку от 0 до 360 (см. degree): на нём
+        шаг по таблице MOVE_ANGLES совпадает со старым расчётом через радианы точно.
+        '''
+        if action == 'turn_left':
+            self.sight_dir -= 1
+        elif action == 'turn_right':
+            self.sight_dir += 1
+        elif action == 'forward':
+            self.move_obj(1)
+        elif action == 'back':
+            self.move_obj(-1)
+        elif action == 'flip':
+            self.sight_dir += 180
+        else:
+            raise ValueError('Не умеем мы такое делать: ' + str(action))
+        self.sight_dir = degree(self.sight_dir)
+
+    def get_data_of_sighter(self, pose=None):
         '''
         Возвращает информацию о том объекте, который находится под
         индексом sight.
@@ -189,69 +722,129 @@ class GameMap:
             'hp' : int -- количество единиц жизни у него.
             coords : (int, int) -- координата, где расположен объект.
         }
+        pose -- см. get_sight (координаты и угол берутся из него).
         '''
+        coords = self.objects[self.sight].coords if pose is None else pose[0]
         info = dict()
         info['name'] = self.objects[self.sight].name
         info['hp'] = self.objects[self.sight].hp
-        info['coords'] = (int(self.objects[self.sight].coords[0]), int(self.objects[self.sight].coords[1]))
-        info['angle'] = self.sight_dir
+        info['coords'] = (int(coords[0]), int(coords[1]))
+        info['angle'] = self.sight_dir if pose is None else degree(pose[1])
         return info
 
-    def get_biom_info(self):
+    def get_biom_info(self, pose=None):
         '''
-        Возвращает тип биома (str), в котором на данный момент находится игрок.
+        Возвращает словарь с информацией о биомах вокруг игрока:
+        {
+            'type' : str -- тип биома, в котором на данный момент находится игрок.
+            'horizon' : [str] -- типы биомов на линии горизонта (на расстоянии sight_len),
+            по градусу на столбец, от левого края поля зрения к правому (как 'move').
+        }
         Основной тип биома -- STD_BIOM (значение можно посмотреть/поменять в классе биома).
+        pose -- см. get_sight.
         '''
+        if pose is None:
+            coords = self.objects[self.sight].coords
+            sight_dir = self.sight_dir
+        else:
+            coords = pose[0]
+            sight_dir = degree(pose[1])
         biom_info = dict()
-        for i in self.bioms:
-            if i.is_in(self.objects[self.sight].coords):
-                biom_info['type'] = i.type
-        if not 'type' in biom_info:
-            biom_info['type'] = Biom.STD_BIOM
-        right_angle_of_vision = degree(self.sight_dir - GameMap.HALF_OF_VISION_ANGLE)
-        left_angle_of_vision = degree(self.sight_dir + GameMap.HALF_OF_VISION_ANGLE)
-        
-        #left_dist_from_player_to_side_of_biom
+        biom_info['type'] = self.get_biom_at(coords)
+        horizon = self.get_horizon(coords)
+        left_side_of_vision = round(sight_dir - GameMap.HALF_OF_VISION_ANGLE)
+        biom_info['horizon'] = [horizon[(left_side_of_vision + column) % 360]\
+        for column in range(2 * GameMap.HALF_OF_VISION_ANGLE)]
         return biom_info
 
-    def add_biom(self, center, radius, biom_type=None):
+    def get_biom_at(self, coords):
+        '''
+        Возвращает тип биома (str), в котором лежит точка coords : (float, float).
+        Если биомы накладываются друг на друга, побеждает добавленный позже.
+        '''
+        bioms = self.biom_index.query_point(coords)
+        if not bioms:
+            return Biom.STD_BIOM
+        return max(bioms, key=self.biom_order.get).type
+
+    def get_horizon(self, coords=None):
+        '''
+        Возвращает список из 360 типов биомов (str), которые лежат на расстоянии sight_len
+        от игрока, по одному на каждый целый градус полярного угла.
+        Горизонт далеко, поэтому он считается от центра клетки HORIZON_CELL_SIZE, в которой
+        стоит игрок, и пересчитывается, только когда игрок переходит в другую клетку (или
+        меняются биомы).
+        coords : (float, float) -- откуда смотреть (по умолчанию -- оттуда, где стоит игрок).
+        '''
+        sighter = self.objects[self.sight]
+        if coords is None:
+            coords = sighter.coords
+        cell = (math.floor(coords[0] / HORIZON_CELL_SIZE), math.floor(coords[1] / HORIZON_CELL_SIZE))
+        key = (cell, sighter.sight_len)
+        if self.horizon_key != key:
+            center_x = (cell[0] + 0.5) * HORIZON_CELL_SIZE
+            center_y = (cell[1] + 0.5) * HORIZON_CELL_SIZE
+            self.horizon = [self.get_biom_at((center_x + sighter.sight_len * ANGLES.cos(angle),\
+            center_y + sighter.sight_len * ANGLES.sin(angle))) for angle in range(360)]
+            self.horizon_key = key
+        return self.horizon
+
+    def add_biom(self, center, radius, biom_type=None, order=None):
         '''
         Добавляет на игровую карту биом типа bioms_type : str (если не указывать, будет
         выбран случайный тип биома) с центром в точке center : (float, float); радиус
         биома равен radius : float.
+        order : int -- порядковый номер биома в biom_order (по умолчанию -- следующий по
+        счёту); нужен, когда биомы подгружаются не в том порядке, в каком добавлялись.
+        Возвращает созданный биом.
+        '''
+        biom = Biom(center, radius, biom_type)
+        self.bioms.append(biom)
+        self.biom_index.insert(biom)
+        if order is None:
+            order = self.bioms_added
+        self.biom_order[biom] = order
+        self.bioms_added = max(self.bioms_added, order) + 1
+        self.horizon_key = None
+        return biom
+
+    def remove_biom(self, biom):
         '''
-        self.bioms.append(Biom(center, radius, biom_type))
+        Убирает с карты биом biom : Biom.
+        '''
+        self.bioms.remove(biom)
+        self.biom_index.remove(biom)
+        del self.biom_order[biom]
+        self.horizon_key = None
 
     def add_wall(self, start_point, finish_point):
         '''
         Добавляет на карту стену, которая идёт от точки start_point : (float, float) до точки
         finish_point : (float, float).
-        Реализация следующая:
-        Стена представляется в виде набора точек, которые лежат на расстоянии 1 / WALL_POINTS_FREQ
-        друг от друга и все принадлежат отрезку (start_point, finish_point), который является стеной.
-        '''
-        x1 = start_point[0]
-        y1 = start_point[1]
-        x2 = finish_point[0]
-        y2 = finish_point[1]
-        line_a = y2 - y1
-        line_b = x1 - x2
-        line_c = -line_a * x1 - line_b * y1
-        #количество точек, расположенных на отрезке стены.
-        points_number = int(get_dist_between_points(start_point, finish_point) * WALL_POINTS_FREQ)
-        x_change = 0
-        left = x1
-        right = x2
-        while (right - left) >= EPS:
-            temp_x = (left + right) / 2
-            temp_y = (line_a * temp_x + line_c) / (-line_b)
-            if get_dist_between_points(start_point, (temp_x, temp_y)) < 1 / WALL_POINTS_FREQ:
-                left = temp_x
-            else:
-                right = temp_x
-        x_change = (left + right) / 2 - x1
-        now_point_x = x1
-        while now_point_x < x2:
-            now_point_y = (line_a * now_point_x + line_c) / (-line_b)
-            self.add_object('wall', (now_point_x, now_point_y))
-            now_point_x += x_change
+        Стена хранится как отрезок (см. Wall), а не как набор точек; от её длины зависит
+        только то, во сколько клеток wall_index она записана.
+        Возвращает созданную стену.
+        '''
+        wall = Wall(start_point, finish_point)
+        self.insert_wall(wall)
+        return wall
+
+    def insert_wall(self, wall, order=None):
+        '''
+        Кладёт на карту уже готовую стену wall : Wall (например, прочитанную из файла).
+        order : int -- порядковый номер стены в wall_order (как в add_biom).
+        '''
+        self.walls.append(wall)
+        self.wall_index.insert(wall)
+        if order is None:
+            order = self.walls_added
+        self.wall_order[wall] = order
+        self.walls_added = max(self.walls_added, order) + 1
+
+    def remove_wall(self, wall):
+        '''
+        Убирает с карты стену wall : Wall.
+        '''
+        self.walls.remove(wall)
+        self.wall_index.remove(wall)
+        del self.wall_order[wall]
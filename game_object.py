@@ -3,36 +3,188 @@
 Он содержит класс объекта и методы для его обработки.
 '''
 
+import spatial_index
+from array import array
+
+#'occluder' -- картинка объекта непрозрачная, так что за ним ничего не видно (см. occlusion).
+#'lod_thresholds' -- при dist меньше первого порога рисуется картинка name_long, меньше
+#второго -- name_very_long (см. interface.get_picture_name).
+#'mip_levels' -- сколько раз картинку объекта уменьшать вдвое при загрузке (см.
+#sprite_cache.build_mip_chain).
 FEATURES = {
     "zombie" : {
         'is_visible' : True,
         'hp' : 15,
         'sight_len' : 10,
-        'resizable' : True
+        'resizable' : True,
+        'occluder' : False,
+        'lod_thresholds' : (0.7, 0.4),
+        'mip_levels' : 4,
     },
     "tree" : {
         'is_visible' : True,
         'hp' : 15,
         'sight_len' : None,
         "resizable" : True,
+        'occluder' : False,
+        'lod_thresholds' : (0.7, 0.4),
+        'mip_levels' : 4,
     },
     "wall" : {
         'is_visible' : True,
         'hp' : 1000,
         'sight_len' : None,
         "resizable" : True,
+        'occluder' : True,
+        'lod_thresholds' : (0.7, 0.4),
+        'mip_levels' : 0,
     },
     'sun' : {
         'is_visible' : True,
         'hp' : 1,
         'sight_len': None,
         'resizable' : False,
+        'occluder' : False,
+        'lod_thresholds' : (),
+        'mip_levels' : 0,
     },
 }
 
+#Номера типов объектов: в хранилище вместо названия лежит его номер в TYPES.
+TYPES = list(FEATURES)
+TYPE_IDS = {name : type_id for type_id, name in enumerate(TYPES)}
+
+#Биты поля flags в хранилище объектов.
+FLAG_VISIBLE = 1
+FLAG_RESIZABLE = 2
+#Строка занята живым объектом (у удалённых все флаги сброшены).
+FLAG_ALIVE = 4
+
+class ObjectStore:
+    '''
+    Хранилище объектов "по столбцам": вместо списка экземпляров GameObject (у каждого из
+    которых свой __dict__ с копией характеристик из FEATURES) все объекты лежат в
+    нескольких типизированных массивах, по строке на объект.
+    xs, ys : array('d') -- координаты объектов.
+    hp : array('i') -- здоровье объектов.
+    type_ids : array('B') -- номера типов объектов в TYPES (остальные характеристики
+    типа берутся из FEATURES).
+    flags : array('B') -- битовые флаги объектов (FLAG_VISIBLE, FLAG_RESIZABLE, FLAG_ALIVE).
+    index : spatial_index.UniformGrid -- пространственный индекс по объектам, у которых
+    resizable истинно (или None, если index_cell_size не задан).
+    unbounded : [int] -- номера объектов, у которых resizable ложно (в индекс не попадают).
+    listeners : [function] -- кого звать, когда объект появился, сдвинулся или удалён:
+    каждый вызывается как listener(номер объекта, старые координаты или None, новые
+    координаты или None).
+    free : [int] -- номера строк удалённых объектов. Удалённый объект оставляет после себя
+    "дырку" (все флаги сброшены, так что он невидим и ни в каком индексе не числится),
+    которую занимает следующий добавленный объект, -- так номера остальных объектов не
+    съезжают.
+    Хранилище ведёт себя как список объектов: len(store), store[i] и перебор в цикле
+    отдают GameObject, который является лишь "окном" в соответствующую строку.
+    '''
+    def __init__(self, index_cell_size=None):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.hp = array('i')
+        self.type_ids = array('B')
+        self.flags = array('B')
+        self.index = None
+        if index_cell_size is not None:
+            self.index = spatial_index.UniformGrid(index_cell_size, self.xs, self.ys)
+        self.unbounded = []
+        self.listeners = []
+        self.free = []
+
+    def append(self, name, coords):
+        '''
+        Добавляет в хранилище объект name : str, стоящий в точке coords : (float, float).
+        Возвращает номер строки (int), в которую он попал.
+        '''
+        if not name in FEATURES:
+            raise ValueError('''
+            Разрывная!! Юморишь!! 
+            Создайте нормального монстра, предусмотренного игрой.
+            ''')
+        features = FEATURES[name]
+        flags = FLAG_ALIVE + FLAG_VISIBLE * features['is_visible'] + FLAG_RESIZABLE * features['resizable']
+        if self.free:
+            obj_index = self.free.pop()
+            self.xs[obj_index] = coords[0]
+            self.ys[obj_index] = coords[1]
+            self.hp[obj_index] = features['hp']
+            self.type_ids[obj_index] = TYPE_IDS[name]
+            self.flags[obj_index] = flags
+        else:
+            obj_index = len(self.xs)
+            self.xs.append(coords[0])
+            self.ys.append(coords[1])
+            self.hp.append(features['hp'])
+            self.type_ids.append(TYPE_IDS[name])
+            self.flags.append(flags)
+        if not features['resizable']:
+            self.unbounded.append(obj_index)
+        elif self.index is not None:
+            self.index.insert(obj_index, coords)
+        for listener in self.listeners:
+            listener(obj_index, None, coords)
+        return obj_index
+
+    def set_coords(self, obj_index, coords):
+        '''
+        Переставляет объект под номером obj_index : int в точку coords : (float, float),
+        не забывая про пространственный индекс.
+        '''
+        old_coords = (self.xs[obj_index], self.ys[obj_index])
+        if self.index is not None and self.flags[obj_index] & FLAG_RESIZABLE:
+            self.index.move(obj_index, old_coords, coords)
+        self.xs[obj_index] = coords[0]
+        self.ys[obj_index] = coords[1]
+        for listener in self.listeners:
+            listener(obj_index, old_coords, coords)
+
+    def remove(self, obj_index):
+        '''
+        Удаляет из хранилища объект под номером obj_index : int (его строка становится
+        свободной, см. free).
+        '''
+        if not self.flags[obj_index] & FLAG_ALIVE:
+            raise ValueError('Нельзя убить то, что уже мертво (объект ' + str(obj_index) + ').')
+        coords = (self.xs[obj_index], self.ys[obj_index])
+        if not self.flags[obj_index] & FLAG_RESIZABLE:
+            self.unbounded.remove(obj_index)
+        elif self.index is not None:
+            self.index.remove(obj_index, coords)
+        self.flags[obj_index] = 0
+        self.free.append(obj_index)
+        for listener in self.listeners:
+            listener(obj_index, coords, None)
+
+    def is_alive(self, obj_index):
+        '''
+        Возвращает истину, если строка obj_index : int занята объектом (а не удалённым).
+        '''
+        return bool(self.flags[obj_index] & FLAG_ALIVE)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, obj_index):
+        if obj_index < 0:
+            obj_index += len(self.xs)
+        if not 0 <= obj_index < len(self.xs):
+            raise IndexError('Нет в хранилище объекта под номером ' + str(obj_index))
+        return GameObject.view(self, obj_index)
+
+    def __iter__(self):
+        for obj_index in range(len(self.xs)):
+            yield GameObject.view(self, obj_index)
+
 class GameObject:
     '''
     Класс игрового объекта.
+    Сам объект данных не хранит: это "окно" в строку store : ObjectStore под номером
+    index : int, поэтому экземпляры дешёвые, и их можно создавать по требованию.
     coords : (int, int) -- координаты на карте.
     name : str -- название объекта.
     is_visible : bool -- истина, если при попадании в поле зрения объект отображается (для
@@ -40,15 +192,64 @@ class GameObject:
     hp : int -- здоровье объекта (у построек, соответственно, -- прочность).
     sight_len : int -- радиус зрения (подробнее можно узнать в ./docs/sight.png. 
     '''
-    def __init__(self, name, coords):
-        if not name in FEATURES:
-            raise ValueError('''
-            Разрывная!! Юморишь!! 
-            Создайте нормального монстра, предусмотренного игрой.
-            ''')
-        self.name = name
-        self.coords = coords
-        self.is_visible = FEATURES[name]['is_visible']
-        self.hp = FEATURES[name]['hp']
-        self.sight_len = FEATURES[name]['sight_len']
-        self.resizable = FEATURES[name]['resizable']
+    __slots__ = ('store', 'index')
+
+    def __init__(self, name, coords, store=None):
+        '''
+        Создаёт объект name : str в точке coords : (float, float), дописывая его в
+        хранилище store : ObjectStore (если его не дали, то в своё собственное).
+        '''
+        if store is None:
+            store = ObjectStore()
+        self.store = store
+        self.index = store.append(name, coords)
+
+    @classmethod
+    def view(cls, store, obj_index):
+        '''
+        Возвращает GameObject, смотрящий на уже существующую строку obj_index : int
+        хранилища store : ObjectStore.
+        '''
+        obj = cls.__new__(cls)
+        obj.store = store
+        obj.index = obj_index
+        return obj
+
+    @property
+    def name(self):
+        return TYPES[self.store.type_ids[self.index]]
+
+    @property
+    def coords(self):
+        return (self.store.xs[self.index], self.store.ys[self.index])
+
+    @coords.setter
+    def coords(self, value):
+        self.store.set_coords(self.index, value)
+
+    @property
+    def hp(self):
+        return self.store.hp[self.index]
+
+    @hp.setter
+    def hp(self, value):
+        self.store.hp[self.index] = value
+
+    @property
+    def is_visible(self):
+        return bool(self.store.flags[self.index] & FLAG_VISIBLE)
+
+    @is_visible.setter
+    def is_visible(self, value):
+        if value:
+            self.store.flags[self.index] |= FLAG_VISIBLE
+        else:
+            self.store.flags[self.index] &= ~FLAG_VISIBLE
+
+    @property
+    def resizable(self):
+        return bool(self.store.flags[self.index] & FLAG_RESIZABLE)
+
+    @property
+    def sight_len(self):
+        return FEATURES[self.name]['sight_len']
@@ -0,0 +1,132 @@
+'''
+Модуль содержит кэш текста для HUD (надписей с информацией об игроке).
+pygame.font.Font.render -- одна из самых медленных функций в кадре, а надписи от кадра к
+кадру почти не меняются. Поэтому подписи ("hp: ", "angle: " и т.д.) рисуются шрифтом один
+раз, значения собираются из заранее нарисованных букв (атласа) и перерисовываются только
+тогда, когда поменялись, а весь HUD лежит на отдельной прозрачной поверхности, которая
+пересобирается, только если что-то в нём изменилось.
+'''
+
+import pygame
+
+#Буквы, которые кладутся в атлас сразу (остальные добавляются, когда встретятся).
+STD_GLYPHS = '0123456789-+.,()e: '
+
+class GlyphAtlas:
+    '''
+    Атлас букв: все буквы, нарисованные шрифтом font цветом color, лежат рядом на одной
+    поверхности.
+    font : pygame.font.Font -- шрифт.
+    color : (int, int, int) -- цвет букв.
+    chars : str -- какие буквы есть в атласе.
+    surface : pygame.Surface -- сам атлас.
+    rects : {str : pygame.Rect} -- где в атласе лежит каждая буква (высота у букв разная:
+    у тех, что с хвостиками вниз, она больше, как и у font.render).
+    '''
+    def __init__(self, font, color, chars=STD_GLYPHS):
+        self.font = font
+        self.color = color
+        self.chars = ''
+        self.surface = None
+        self.rects = dict()
+        self.build(chars)
+
+    def build(self, chars):
+        '''
+        Перерисовывает атлас так, чтобы в нём были буквы chars : str (и те, что уже были).
+        '''
+        self.chars = ''.join(sorted(set(self.chars + chars)))
+        glyphs = [self.font.render(char, False, self.color) for char in self.chars]
+        self.surface = pygame.Surface((max(1, sum(glyph.get_width() for glyph in glyphs)),\
+        max([glyph.get_height() for glyph in glyphs] + [1])), pygame.SRCALPHA)
+        self.rects = dict()
+        left = 0
+        for char, glyph in zip(self.chars, glyphs):
+            self.surface.blit(glyph, (left, 0))
+            self.rects[char] = pygame.Rect(left, 0, glyph.get_width(), glyph.get_height())
+            left += glyph.get_width()
+
+    def render(self, text):
+        '''
+        Возвращает прозрачную поверхность с текстом text : str, собранным из букв атласа.
+        '''
+        missing = set(text) - set(self.rects)
+        if missing:
+            self.build(''.join(missing))
+        surface = pygame.Surface((max(1, self.font.size(text)[0]),\
+        max([self.rects[char].height for char in text] + [1])), pygame.SRCALPHA)
+        for i, char in enumerate(text):
+            #Букву ставим туда же, куда её поставил бы font.render (ширина строки не всегда
+            #равна сумме ширин букв).
+            surface.blit(self.surface, (self.font.size(text[:i])[0], 0), self.rects[char])
+        return surface
+
+class Hud:
+    '''
+    HUD: несколько строк вида "подпись значение", выводимых снизу вверх.
+    font : pygame.font.Font -- шрифт.
+    color : (int, int, int) -- цвет текста.
+    atlas : GlyphAtlas -- буквы для значений.
+    labels : {str : pygame.Surface} -- нарисованные подписи.
+    values : [(str, str, pygame.Surface)] -- подписи, значения строк и картинки значений (с
+    прошлого кадра).
+    overlay : pygame.Surface -- собранный HUD (None -- ещё не собран).
+    renders, rebuilds : int -- сколько раз рисовались значения и пересобирался HUD.
+    '''
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.atlas = GlyphAtlas(font, color)
+        self.labels = dict()
+        self.values = []
+        self.overlay = None
+        self.renders = 0
+        self.rebuilds = 0
+
+    def get_label(self, label):
+        '''
+        Возвращает картинку подписи label : str (рисуется один раз).
+        '''
+        if not label in self.labels:
+            self.labels[label] = self.font.render(label, False, self.color)
+        return self.labels[label]
+
+    def update(self, lines):
+        '''
+        Обновляет строки HUD: lines : [(str, str)] -- пары (подпись, значение), снизу вверх.
+        Перерисовывает только поменявшиеся значения и пересобирает overlay, только если
+        поменялась хоть одна подпись или значение. Каждая строка занимает по высоте столько же, сколько заняла бы
+        font.render(подпись + значение), так что строки стоят там же, где и без HUD.
+        '''
+        dirty = self.overlay is None or len(lines) != len(self.values)
+        if len(lines) != len(self.values):
+            self.values = [(None, None, None)] * len(lines)
+        for i, (label, value) in enumerate(lines):
+            if self.values[i][1] != value:
+                self.values[i] = (label, value, self.atlas.render(value))
+                self.renders += 1
+                dirty = True
+            elif self.values[i][0] != label:
+                self.values[i] = (label, value, self.values[i][2])
+                dirty = True
+        if not dirty:
+            return
+        line_heights = [self.font.size(label + value)[1] for label, value in lines]
+        width = max([self.get_label(label).get_width() + surface.get_width()\
+        for (label, value), (old_label, text, surface) in zip(lines, self.values)] + [1])
+        self.overlay = pygame.Surface((width, max(1, sum(line_heights))), pygame.SRCALPHA)
+        top = self.overlay.get_height()
+        for i, ((label, value), (old_label, text, surface)) in enumerate(zip(lines, self.values)):
+            top -= line_heights[i]
+            label_surface = self.get_label(label)
+            self.overlay.blit(label_surface, (0, top))
+            self.overlay.blit(surface, (label_surface.get_width(), top))
+        self.rebuilds += 1
+
+    def draw(self, screen, lines, left, bottom):
+        '''
+        Выводит на screen строки lines (см. update) так, что левый нижний угол HUD
+        оказывается в точке (left, bottom).
+        '''
+        self.update(lines)
+        screen.blit(self.overlay, (left, bottom - self.overlay.get_height()))
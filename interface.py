@@ -5,14 +5,53 @@
 форму класса.
 '''
 
+import concurrent.futures
+import os
+
 import pygame
+import assets
 import game_map
+import game_object
+import hud
+import occlusion
+import profiler
+import simulation
+import sprite_cache
 
 STD_SIZE_Y = 640
 STD_SIZE_X = 480
 
 INF = 10 ** 10
 
+#Сколько раз в секунду обрабатываются нажатые клавиши (игровых тиков в секунду).
+TICK_RATE = 10
+#Не больше скольких кадров в секунду рисовать.
+MAX_FPS = 60
+#Сколько тиков максимум можно досчитать за раз, если отрисовка затормозила.
+MAX_TICKS_PER_FRAME = 5
+#Сглаживать ли движение между тиками.
+INTERPOLATION = False
+#Полоска земли у горизонта (в цвет далёких биомов) занимает 1/HORIZON_BAND высоты окна.
+HORIZON_BAND = 12
+
+#Сколько потоков масштабируют картинки (1 -- всё в основном потоке, см. draw_objects).
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+#Куда записывать нажатия игрока (по тикам, см. simulation), None -- не записывать.
+RECORD_PATH = None
+
+#Окончания названий картинок для всё более дальних объектов (см. get_picture_name).
+LOD_SUFFIXES = ['', '_long', '_very_long']
+
+#Какие клавиши какие действия игрока (game_map.ACTIONS) вызывают.
+KEY_ACTIONS = {
+    pygame.K_a : 'turn_left',
+    pygame.K_d : 'turn_right',
+    pygame.K_w : 'forward',
+    pygame.K_s : 'back',
+    pygame.K_b : 'flip',
+}
+
 IMAGES = [
     'zombie',
     'sight_dir',
@@ -58,21 +97,197 @@ def draw_object(game_screen, obj, pictures):
             'prior' : float -- приоритет вывода (сначала отрисовываются картинки с наименьшим
             приоритетом).
     }
+    Куски стен (у них есть 'move_end') рисуются через draw_wall.
+    Если в pictures есть 'sprite_cache' (sprite_cache.SpriteCache), отмасштабированные
+    картинки берутся из него.
     '''
-    object_name = obj['name']
+    if 'move_end' in obj:
+        draw_wall(game_screen, obj, pictures)
+        return
     window_size_x = pygame.display.get_surface().get_width()
     window_size_y = pygame.display.get_surface().get_height()
-    if obj['dist'] < 0.4:
-        object_name = object_name + "_very_long"
-    elif obj['dist'] < 0.7:
-        object_name = object_name + "_long"
+    draw_job(game_screen, get_object_job(obj, window_size_x, window_size_y, pictures), pictures)
+
+def draw_job(game_screen, job, pictures):
+    '''
+    Строит (или берёт из pictures['sprite_cache']) картинку для job (см. get_object_job)
+    и выводит её на экран game_screen.
+    '''
+    if job is None:
+        return
+    key, build, place = job
+    with profiler.span('scale'):
+        if 'sprite_cache' in pictures:
+            image = pictures['sprite_cache'].get(key, build)
+        else:
+            image = build()
+    game_screen.blit(image, place)
+
+def get_object_job(obj, window_size_x, window_size_y, pictures):
+    '''
+    Возвращает, что нужно сделать, чтобы вывести объект obj на экран размера window_size_x
+    на window_size_y: (ключ картинки в sprite_cache, функция без аргументов, которая эту
+    картинку строит, (x, y) -- куда её выводить), или None, если выводить нечего.
+    Сама картинка здесь не строится, так что строить её можно где угодно (см. draw_objects).
+    '''
+    if 'move_end' in obj:
+        return get_wall_job(obj, window_size_x, window_size_y, pictures)
+    object_name = get_picture_name(obj['name'], obj['dist'])
+    place_x, place_y, size = get_object_place(obj, window_size_x, window_size_y, pictures)
+    return (object_name, size), lambda: sprite_cache.scale_picture(pictures, object_name, size),\
+    (place_x, place_y)
+
+def draw_objects(game_screen, objects, pictures):
+    '''
+    Выводит на экран объекты objects в том порядке, в каком они идут.
+    Если в pictures есть 'render_pool' (concurrent.futures.Executor), картинки, которых нет
+    в кэше, масштабируются в нём параллельно (pygame.transform отпускает GIL), а в кэш и
+    на экран попадают в основном потоке и в том же порядке, так что кадр выходит точно
+    таким же, как при выводе по одному через draw_object.
+    '''
+    if not 'render_pool' in pictures:
+        for obj in objects:
+            draw_object(game_screen, obj, pictures)
+        return
+    window_size_x = pygame.display.get_surface().get_width()
+    window_size_y = pygame.display.get_surface().get_height()
+    cache = pictures['sprite_cache'] if 'sprite_cache' in pictures else None
+    jobs = []
+    building = dict()
+    for obj in objects:
+        job = get_object_job(obj, window_size_x, window_size_y, pictures)
+        if job is None:
+            continue
+        key, build, place = job
+        image = None
+        if key in building:
+            if cache is not None:
+                #Как и при выводе по одному: второй раз за кадр картинка была бы уже в кэше.
+                cache.hits += 1
+        else:
+            if cache is not None:
+                image = cache.lookup(key)
+            if image is None:
+                building[key] = pictures['render_pool'].submit(build)
+        jobs.append((key, image, place))
+    for key, image, place in jobs:
+        if image is None:
+            with profiler.span('scale'):
+                image = building[key].result()
+            if cache is not None:
+                cache.put(key, image)
+        game_screen.blit(image, place)
+
+def get_object_place(obj, window_size_x, window_size_y, pictures):
+    '''
+    Возвращает, куда и какого размера выводится объект obj (не кусок стены) на экране
+    размера window_size_x на window_size_y: (place_x : float, place_y : float,
+    (int, int) -- размер картинки).
+    '''
     object_size_y = window_size_y * obj['dist']
     object_size_x = window_size_x * obj['dist']
+    if 'sprite_cache' in pictures:
+        size = pictures['sprite_cache'].quantize((object_size_x, object_size_y))
+    else:
+        size = (int(object_size_x), int(object_size_y))
     place_y = (window_size_y - object_size_y) // 2
     place_x = window_size_x * obj['move'] - object_size_x // 2
-    game_screen.blit(pygame.transform.scale(pictures[object_name],\
-    (int(object_size_x), int(object_size_y))), (place_x, place_y))
+    return place_x, place_y, size
+
+
+def get_picture_name(name, dist):
+    '''
+    Возвращает название картинки для объекта name : str, находящегося на расстоянии
+    dist : float (в процентах, как в GameMap.get_sight): для дальних объектов есть
+    отдельные картинки, на какие расстояния -- задаётся в FEATURES[name]['lod_thresholds'].
+    '''
+    level = 0
+    for threshold in game_object.FEATURES[name]['lod_thresholds']:
+        if dist < threshold:
+            level += 1
+    return name + LOD_SUFFIXES[level]
 
+def draw_wall(game_screen, wall, pictures):
+    '''
+    Выводит на экран кусок стены wall (формат см. в GameMap.get_walls_in_sight).
+    Кусок рисуется одной картинкой: текстура растягивается на весь кусок, а сверху и снизу
+    от неё срезается лишнее, чтобы ближний конец был выше дальнего.
+    Как и в draw_object, готовые картинки берутся из pictures['sprite_cache'], если он есть.
+    '''
+    window_size_x = pygame.display.get_surface().get_width()
+    window_size_y = pygame.display.get_surface().get_height()
+    draw_job(game_screen, get_wall_job(wall, window_size_x, window_size_y, pictures), pictures)
+
+def get_wall_job(wall, window_size_x, window_size_y, pictures):
+    '''
+    То же, что и get_object_job, но для куска стены wall.
+    '''
+    place = get_wall_place(wall, window_size_x, window_size_y, pictures)
+    if place is None:
+        return None
+    left_x, place_y, size_x, size_y, left_cut, right_cut = place
+    picture_name = get_picture_name(wall['name'], max(wall['dist'], wall['dist_end']))
+    build = lambda: make_wall_image(sprite_cache.get_mip_source(pictures, picture_name, (size_x, size_y)),\
+    size_x, size_y, left_cut, right_cut)
+    return ('wall', picture_name, size_x, size_y, left_cut, right_cut), build, (left_x, place_y)
+
+def get_wall_place(wall, window_size_x, window_size_y, pictures):
+    '''
+    Возвращает, куда и какого размера выводится кусок стены wall на экране размера
+    window_size_x на window_size_y: (left_x, place_y, size_x, size_y, left_cut, right_cut)
+    (все int; про left_cut и right_cut см. make_wall_image), или None, если выводить нечего.
+    '''
+    left_x = int(window_size_x * wall['move'])
+    right_x = int(window_size_x * wall['move_end'])
+    left_size_y = window_size_y * wall['dist']
+    right_size_y = window_size_y * wall['dist_end']
+    size_x = right_x - left_x
+    size_y = int(max(left_size_y, right_size_y))
+    if 'sprite_cache' in pictures:
+        size_x, size_y = pictures['sprite_cache'].quantize((size_x, size_y))
+    if size_x <= 0 or size_y <= 0:
+        return None
+    left_cut = round((size_y - left_size_y) / 2)
+    right_cut = round((size_y - right_size_y) / 2)
+    return left_x, (window_size_y - size_y) // 2, size_x, size_y, left_cut, right_cut
+
+def get_footprint(obj, window_size_x, window_size_y, pictures):
+    '''
+    Возвращает для объекта obj (или куска стены) то, что нужно occlusion.OcclusionCuller:
+    прямоугольник, который он может закрасить, и то, что он закрывает наверняка (None,
+    если в FEATURES у него не стоит 'occluder' -- тогда через него может быть что-то видно).
+    '''
+    occluder = game_object.FEATURES[obj['name']]['occluder']
+    if 'move_end' in obj:
+        place = get_wall_place(obj, window_size_x, window_size_y, pictures)
+        if place is None:
+            return (0, 0, 0, 0), None
+        left_x, place_y, size_x, size_y, left_cut, right_cut = place
+        bounds = (left_x, left_x + size_x, place_y, place_y + size_y)
+        if not occluder:
+            return bounds, None
+        #Срезанные углы (см. make_wall_image) прозрачные.
+        left_cut = max(left_cut, 0)
+        right_cut = max(right_cut, 0)
+        return bounds, (left_x, left_x + size_x, place_y + left_cut, place_y + size_y - left_cut,\
+        place_y + right_cut, place_y + size_y - right_cut)
+    place_x, place_y, size = get_object_place(obj, window_size_x, window_size_y, pictures)
+    bounds = (place_x, place_x + size[0], place_y, place_y + size[1])
+    if not occluder:
+        return bounds, None
+    return bounds, (bounds[0], bounds[1], bounds[2], bounds[3], bounds[2], bounds[3])
+
+def make_wall_image(picture, size_x, size_y, left_cut, right_cut):
+    '''
+    Растягивает картинку стены picture до размера (size_x, size_y) и делает прозрачными
+    углы над и под трапецией, у которой левый край обрезан на left_cut пикселей сверху и
+    снизу, а правый -- на right_cut.
+    '''
+    image = pygame.transform.scale(picture, (size_x, size_y)).convert_alpha()
+    pygame.draw.polygon(image, (0, 0, 0, 0), [(0, 0), (size_x, 0), (size_x, right_cut), (0, left_cut)])
+    pygame.draw.polygon(image, (0, 0, 0, 0), [(0, size_y), (size_x, size_y),\
+    (size_x, size_y - right_cut), (0, size_y - left_cut)])
+    return image
 
 def draw_player_data(game_screen, data, pictures):
     '''
@@ -88,99 +303,245 @@ def draw_player_data(game_screen, data, pictures):
             coords : (float, float) -- координата, где расположен объект.
         }
     Кроме того, рисует на игровом экране направление взгляда игрока (т. н. "прицел").
+    Если в pictures есть 'hud' (hud.Hud), текст берётся из него и перерисовывается, только
+    когда поменялся.
     '''
     text = []
-    text.append('object: ' + data['name'])
-    text.append('hp: ' + str(data['hp']))
-    text.append('angle: ' + str(data['angle']))
-    text.append('coordinates: ' + str(data['coords']))
+    text.append(('object: ', data['name']))
+    text.append(('hp: ', str(data['hp'])))
+    text.append(('angle: ', str(data['angle'])))
+    text.append(('coordinates: ', str(data['coords'])))
     window_size_x = pygame.display.get_surface().get_width()
     window_size_y = pygame.display.get_surface().get_height()
     sight_dir_size_x = pictures['sight_dir'].get_rect().width * 1.5
     sight_dir_size_y =  pictures['sight_dir'].get_rect().height
     text_height = sight_dir_size_y * 0.5
-    for i in text:
-        rez = pictures['info_font'].render(i, False, pictures['info_font_color'])
-        text_height += rez.get_height()
-        info_top_side = window_size_y - text_height
-        game_screen.blit(rez, (sight_dir_size_x + 10, info_top_side))
+    if 'hud' in pictures:
+        pictures['hud'].draw(game_screen, text, sight_dir_size_x + 10, window_size_y - text_height)
+    else:
+        for label, value in text:
+            rez = pictures['info_font'].render(label + value, False, pictures['info_font_color'])
+            text_height += rez.get_height()
+            info_top_side = window_size_y - text_height
+            game_screen.blit(rez, (sight_dir_size_x + 10, info_top_side))
     scope_size_x = pictures['scope'].get_rect().width
     scope_size_y =  pictures['scope'].get_rect().height
     game_screen.blit(pictures['scope'], (window_size_x // 2 - scope_size_x // 2, window_size_y // 2 - scope_size_y // 2))
 
+def draw_profile(game_screen, frame, pictures):
+    '''
+    Выводит в правом нижнем углу экрана game_screen замеры кадра frame (см.
+    profiler.Profiler.history): время этапов в миллисекундах и счётчики, тем же шрифтом,
+    что и draw_player_data. Если кадра нет (frame равно None), ничего не выводит.
+    '''
+    if frame is None:
+        return
+    text = ['{}: {:.2f} ms'.format(name, value) for name, value in frame['spans'].items()]
+    text += ['{}: {}'.format(name, value) for name, value in frame['counters'].items()]
+    window_size_x = pygame.display.get_surface().get_width()
+    window_size_y = pygame.display.get_surface().get_height()
+    text_height = 0
+    for i in reversed(text):
+        rez = pictures['info_font'].render(i, False, pictures['info_font_color'])
+        text_height += rez.get_height()
+        game_screen.blit(rez, (window_size_x - rez.get_width() - 10, window_size_y - text_height))
+
 def draw_biom(screen, pictures, biom):
     '''
-    Отрисовывает небольшую "линию горизонта": делает небо синим, землю -- зелёной.
-    Возможно, в будущем будут добавлены биомы, но пока что -- так-с.
+    Отрисовывает небольшую "линию горизонта": небо и землю в цвет биома, в котором стоит
+    игрок, а если есть biom['horizon'] -- ещё и небо с полоской земли у горизонта в цвета
+    биомов, которые видны вдалеке (по столбцу на градус, соседние одинаковые столбцы
+    рисуются одним прямоугольником).
     И рисует Солнце*
     '''
     window_size_x = pygame.display.get_surface().get_width()
     window_size_y = pygame.display.get_surface().get_height()
     pygame.draw.rect(screen, pictures[biom['type'] +'_sky_color'], (0, 0, window_size_x, window_size_y // 2))
     pygame.draw.rect(screen, pictures[biom['type'] + '_soil_color'], (0, window_size_y // 2, window_size_x, window_size_y))
+    if not 'horizon' in biom:
+        return
+    horizon = biom['horizon']
+    band_y = window_size_y // HORIZON_BAND
+    start = 0
+    for column in range(1, len(horizon) + 1):
+        if column < len(horizon) and horizon[column] == horizon[start]:
+            continue
+        left = window_size_x * start // len(horizon)
+        right = window_size_x * column // len(horizon)
+        pygame.draw.rect(screen, pictures[horizon[start] + '_sky_color'], (left, 0, right - left, window_size_y // 2))
+        pygame.draw.rect(screen, pictures[horizon[start] + '_soil_color'], (left, window_size_y // 2, right - left, band_y))
+        start = column
 
-def draw_game_map(game_screen, game_map, pictures):
+def draw_game_map(game_screen, game_map, pictures, pose=None):
     '''
     Выводит на экран game_screen игровую карту game_map : GameMap от первого лица.
+    Если в pictures есть 'occlusion' (occlusion.OcclusionCuller), закрытые объекты не
+    рисуются вовсе.
+    pose : ((float, float), float) -- если задано, рисовать из этой точки и в этом
+    направлении (см. GameMap.get_sight), не трогая саму карту.
     '''
-    objects = game_map.get_sight()
-    objects.sort(key=lambda a: a['prior'], reverse=True)
-    draw_biom(game_screen, pictures, game_map.get_biom_info())
+    with profiler.span('get_sight'):
+        objects = game_map.get_sight(pose=pose)
+    profiler.count('objects_considered', len(objects))
+    with profiler.span('sort'):
+        objects.sort(key=lambda a: a['prior'], reverse=True)
+    with profiler.span('get_biom_info'):
+        biom_info = game_map.get_biom_info(pose)
+    with profiler.span('draw_biom'):
+        draw_biom(game_screen, pictures, biom_info)
+    if 'occlusion' in pictures:
+        window_size_x = pygame.display.get_surface().get_width()
+        window_size_y = pygame.display.get_surface().get_height()
+        with profiler.span('occlusion'):
+            objects = pictures['occlusion'].cull(objects, window_size_x, window_size_y,\
+            lambda obj: get_footprint(obj, window_size_x, window_size_y, pictures))
+        profiler.count('objects_culled', pictures['occlusion'].culled)
+    profiler.count('objects_drawn', len(objects))
     #print(objects)
     #input()
-    for obj in objects:
-        draw_object(game_screen, obj, pictures)
-    draw_sight_dir(game_screen, game_map.sight_dir, pictures)
-    draw_player_data(game_screen, game_map.get_data_of_sighter(), pictures)
+    with profiler.span('draw_objects'):
+        draw_objects(game_screen, objects, pictures)
+    data = game_map.get_data_of_sighter(pose)
+    draw_sight_dir(game_screen, data['angle'], pictures)
+    with profiler.span('draw_player_data'):
+        draw_player_data(game_screen, data, pictures)
+    if profiler.ENABLED and profiler.OVERLAY:
+        draw_profile(game_screen, profiler.PROFILER.get_last_frame(), pictures)
 
-def main(game_screen, pictures):
+def load_pictures():
     '''
-    Основной цикл работы программы. 
+    Заводит словарь (assets.AssetManager), который потом передаётся во все функции
+    отрисовки: картинки из IMAGES, шрифт и текст HUD в нём загружаются при первом обращении
+    (или заранее, через pictures.preload()), вместе с цепочками уменьшенных копий (см.
+    sprite_cache.build_mip_chain) для тех, у кого в FEATURES есть 'mip_levels', а цвета, кэш отмасштабированных картинок,
+    отсечение закрытых объектов и пул потоков для масштабирования (если RENDER_WORKERS
+    больше 1) лежат сразу.
+    Окно (pygame.display.set_mode) к этому моменту уже должно быть создано.
     '''
-    timer = pygame.time.get_ticks()
-    game_is_finished = False
-    while not game_is_finished:
-        draw_game_map(screen, game_map, pictures)
-        pygame.display.update()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                game_is_finished = True
-            pressed_keys = pygame.key.get_pressed()
-            if pygame.time.get_ticks() - timer >= 100:
-                if pressed_keys[pygame.K_a]:
-                    game_map.sight_dir -= 1
-                if pressed_keys[pygame.K_d]:
-                    game_map.sight_dir += 1
-                if pressed_keys[pygame.K_w]:
-                    game_map.move_obj(1)
-                if pressed_keys[pygame.K_s]:
-                    game_map.move_obj(-1)
-                if pressed_keys[pygame.K_b]:
-                   game_map.sight_dir += 180
-                timer = pygame.time.get_ticks()
-                screen.fill((0, 0, 0))
-                pygame.display.flip()
-
-if __name__ == "__main__":
-    pygame.init()
-    game_map = game_map.GameMap()
-    game_map.add_object('zombie', (0, 0), True)
-    game_map.add_object('zombie', (0, 7))
-    game_map.add_object('zombie', (0, -7))
-    game_map.add_object('tree', (3, 5))
-    game_map.add_object('tree', (-4, -2))
-    game_map.add_object('sun', (INF, 2 * INF))
-    #game_map.add_biom((0, 0), 5, 'desert')
-    screen = pygame.display.set_mode((STD_SIZE_Y, STD_SIZE_X))
-    pictures = dict()
+    pictures = assets.AssetManager()
     for pic in IMAGES:
-        pictures[pic] = pygame.image.load('./images/' + pic + '.png').convert_alpha()
-    pictures['info_font'] = pygame.font.SysFont('ubuntu', 14)
+        pictures.add_image(pic, './images/' + pic + '.png')
+    for name, features in game_object.FEATURES.items():
+        for suffix in LOD_SUFFIXES[:len(features['lod_thresholds']) + 1]:
+            if features['mip_levels'] and name + suffix in IMAGES:
+                pictures.add_loader(name + suffix + sprite_cache.MIP_SUFFIX, lambda pic=name + suffix,\
+                levels=features['mip_levels']: sprite_cache.build_mip_chain(pictures[pic], levels))
+    pictures.add_loader('info_font', lambda: pygame.font.SysFont('ubuntu', 14))
     pictures['info_font_color'] = (255, 255, 255)
     pictures['wood_soil_color'] = (65, 174, 60)
     pictures['wood_sky_color'] = (39, 154, 214)
     pictures['desert_soil_color'] = (228, 206, 60)
     pictures['desert_sky_color'] = (39, 154, 214)
     pictures['back_color'] = (10, 10, 10)
-    game_map.add_wall((-10, 8), (10, 9))
-    main(game_map, pictures)
+    pictures['sprite_cache'] = sprite_cache.SpriteCache()
+    pictures['occlusion'] = occlusion.OcclusionCuller()
+    if RENDER_WORKERS > 1:
+        pictures['render_pool'] = concurrent.futures.ThreadPoolExecutor(RENDER_WORKERS)
+    pictures.add_loader('hud', lambda: hud.Hud(pictures['info_font'], pictures['info_font_color']))
+    return pictures
+
+def read_actions(pressed_keys):
+    '''
+    Возвращает список действий (см. game_map.ACTIONS), соответствующих зажатым клавишам
+    pressed_keys (то, что возвращает pygame.key.get_pressed()).
+    '''
+    return [action for key, action in KEY_ACTIONS.items() if pressed_keys[key]]
+
+def get_view_state(game_map):
+    '''
+    Возвращает то, что нужно запомнить для сглаживания между тиками: направление взгляда и
+    координаты того, от чьего лица ведётся наблюдение.
+    '''
+    return (game_map.sight_dir, game_map.objects[game_map.sight].coords)
+
+def draw_interpolated(game_screen, game_map, pictures, previous_state, alpha):
+    '''
+    Рисует кадр так, будто с состояния previous_state (см. get_view_state) до текущего
+    прошла доля alpha : float тика. Промежуточные направление взгляда и координаты игрока
+    передаются в draw_game_map как pose, так что сама карта (и всё, что следит за
+    перемещениями объектов) о них не знает. Резкие развороты (больше чем на 90 градусов
+    за тик) не сглаживаются.
+    '''
+    current_state = get_view_state(game_map)
+    turn = (current_state[0] - previous_state[0] + 180) % 360 - 180
+    if abs(turn) > 90:
+        turn = 0
+        alpha = 1
+    previous_coords = previous_state[1]
+    current_coords = current_state[1]
+    coords = (previous_coords[0] + (current_coords[0] - previous_coords[0]) * alpha,\
+    previous_coords[1] + (current_coords[1] - previous_coords[1]) * alpha)
+    draw_game_map(game_screen, game_map, pictures, (coords, current_state[0] - turn * (1 - alpha)))
+
+def main(game_screen, game_map, pictures, recording=None):
+    '''
+    Основной цикл работы программы.
+    Игра живёт тиками фиксированной длины (TICK_RATE тиков в секунду): клавиши
+    опрашиваются один раз за тик, и по ним двигается игрок. Кадры рисуются не чаще MAX_FPS
+    раз в секунду и только тогда, когда картинка могла поменяться. Если ничего не
+    происходит, цикл спит в ожидании событий и процессор не грузит.
+    Если INTERPOLATION истинно, движение между тиками сглаживается (см. draw_interpolated).
+    Каждый нарисованный кадр завершается profiler.end_frame (см. profiler).
+    Если передан список recording, в него дописываются действия каждого тика (чтобы потом
+    проиграть их через simulation.replay).
+    '''
+    clock = pygame.time.Clock()
+    tick_length = 1000 / TICK_RATE
+    accumulator = 0
+    last_time = pygame.time.get_ticks()
+    previous_state = get_view_state(game_map)
+    is_idle = True
+    dirty = True
+    while True:
+        events = pygame.event.get()
+        if not events and not dirty and is_idle:
+            #Ничего не зажато и перерисовывать нечего -- спим до первого события.
+            events = [pygame.event.wait()]
+            last_time = pygame.time.get_ticks()
+        for event in events:
+            if event.type == pygame.QUIT:
+                return
+            if event.type == pygame.KEYDOWN and is_idle:
+                #Первое нажатие после простоя обрабатываем сразу, не дожидаясь конца тика.
+                accumulator = tick_length
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.VIDEORESIZE):
+                dirty = True
+        now = pygame.time.get_ticks()
+        accumulator = min(accumulator + now - last_time, MAX_TICKS_PER_FRAME * tick_length)
+        last_time = now
+        while accumulator >= tick_length:
+            accumulator -= tick_length
+            previous_state = get_view_state(game_map)
+            actions = read_actions(pygame.key.get_pressed())
+            if recording is not None:
+                recording.append(actions)
+            for action in actions:
+                game_map.apply_action(action)
+            is_idle = not actions
+            if actions:
+                dirty = True
+        if INTERPOLATION and previous_state != get_view_state(game_map):
+            draw_interpolated(game_screen, game_map, pictures, previous_state,\
+            accumulator / tick_length)
+            with profiler.span('display.update'):
+                pygame.display.update()
+            profiler.end_frame()
+        elif dirty:
+            draw_game_map(game_screen, game_map, pictures)
+            with profiler.span('display.update'):
+                pygame.display.update()
+            profiler.end_frame()
+        dirty = False
+        clock.tick(MAX_FPS)
+
+if __name__ == "__main__":
+    pygame.init()
+    game_map = simulation.get_std_scene()
+    #game_map.add_biom((0, 0), 5, 'desert')
+    screen = pygame.display.set_mode((STD_SIZE_Y, STD_SIZE_X))
+    pictures = load_pictures()
+    pictures.preload()
+    recording = [] if RECORD_PATH is not None else None
+    main(screen, game_map, pictures, recording)
+    if recording is not None:
+        simulation.write_inputs(RECORD_PATH, recording)
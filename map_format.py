@@ -0,0 +1,97 @@
+'''
+Модуль описывает двоичный формат, в котором куски карты (объекты, стены и биомы)
+хранятся на диске.
+Формат простой: заголовок, а за ним записи фиксированной длины, так что файл можно
+отобразить в память (mmap) и разбирать записи прямо оттуда, ничего не копируя.
+Заголовок: MAGIC, версия формата и количество объектов, стен и биомов.
+Объект: x, y (double), hp (int32), номер типа в game_object.TYPES и флаги (по байту).
+Стена: номер (uint64), x и y начала, x и y конца (double), прочность (int32), видимость
+(байт).
+Биом: номер (uint64), x и y центра, радиус (double), номер типа в Biom.types (байт).
+Номер стены или биома не меняется при сохранении и загрузке: по нему одну и ту же стену,
+записанную в несколько кусков, можно узнать (см. chunks).
+Все числа -- little-endian.
+'''
+
+import mmap
+import struct
+
+import game_map
+import game_object
+
+MAGIC = b'ZMAP'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHIII')
+OBJECT = struct.Struct('<ddiBB')
+WALL = struct.Struct('<QddddiB')
+BIOM = struct.Struct('<QdddB')
+
+def pack(objects, walls, bioms):
+    '''
+    Упаковывает в байты (bytes) объекты objects : [(str, (float, float), int, int)] --
+    (название, координаты, hp, флаги из game_object), стены walls : [(int, Wall)] и
+    биомы bioms : [(int, Biom)] (вместе с их номерами).
+    '''
+    parts = [HEADER.pack(MAGIC, VERSION, len(objects), len(walls), len(bioms))]
+    for name, coords, hp, flags in objects:
+        parts.append(OBJECT.pack(coords[0], coords[1], hp, game_object.TYPE_IDS[name], flags))
+    for wall_id, wall in walls:
+        parts.append(WALL.pack(wall_id, wall.start[0], wall.start[1], wall.finish[0], wall.finish[1],\
+        wall.hp, wall.is_visible))
+    for biom_id, biom in bioms:
+        parts.append(BIOM.pack(biom_id, biom.center[0], biom.center[1], biom.radius,\
+        game_map.Biom.types.index(biom.type)))
+    return b''.join(parts)
+
+def unpack(buffer):
+    '''
+    Разбирает буфер buffer (bytes, memoryview или mmap), записанный pack, и возвращает
+    тройку (объекты, стены, биомы) в том же виде, в каком они передаются в pack.
+    Если заголовок не тот или длина буфера не сходится с ним, бросает ValueError.
+    '''
+    if len(buffer) < HEADER.size:
+        raise ValueError('Это не кусок карты (или карта из другой версии игры).')
+    magic, version, objects_number, walls_number, bioms_number = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Это не кусок карты (или карта из другой версии игры).')
+    if len(buffer) != HEADER.size + objects_number * OBJECT.size + walls_number * WALL.size\
+    + bioms_number * BIOM.size:
+        raise ValueError('Кусок карты обрезан (или к нему что-то прилипло), так его не прочесть.')
+    view = memoryview(buffer)
+    offset = HEADER.size
+    objects = []
+    end = offset + objects_number * OBJECT.size
+    for x, y, hp, type_id, flags in OBJECT.iter_unpack(view[offset:end]):
+        objects.append((game_object.TYPES[type_id], (x, y), hp, flags))
+    offset = end
+    walls = []
+    end = offset + walls_number * WALL.size
+    for wall_id, start_x, start_y, finish_x, finish_y, hp, is_visible in WALL.iter_unpack(view[offset:end]):
+        wall = game_map.Wall((start_x, start_y), (finish_x, finish_y))
+        wall.hp = hp
+        wall.is_visible = bool(is_visible)
+        walls.append((wall_id, wall))
+    offset = end
+    bioms = []
+    end = offset + bioms_number * BIOM.size
+    for biom_id, center_x, center_y, radius, type_id in BIOM.iter_unpack(view[offset:end]):
+        bioms.append((biom_id, game_map.Biom((center_x, center_y), radius, game_map.Biom.types[type_id])))
+    view.release()
+    return objects, walls, bioms
+
+def write_file(path, objects, walls, bioms):
+    '''
+    Записывает объекты, стены и биомы (см. pack) в файл path : str.
+    '''
+    with open(path, 'wb') as output_file:
+        output_file.write(pack(objects, walls, bioms))
+
+def read_file(path):
+    '''
+    Читает файл path : str, записанный write_file, отображая его в память, и возвращает
+    то же, что и unpack.
+    '''
+    with open(path, 'rb') as input_file:
+        with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return unpack(buffer)
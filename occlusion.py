@@ -0,0 +1,138 @@
+'''
+Модуль отсекает то, что на экране всё равно не будет видно (occlusion culling).
+Кадр рисуется от дальнего к ближнему, и всё, что закрыто стеной, сначала
+масштабируется и выводится, а потом закрашивается. Поэтому перед отрисовкой
+список объектов проходится в обратную сторону, от ближнего к дальнему: для каждого
+столбца экрана запоминается, какую полосу по высоте уже закрыли непрозрачные
+объекты (у которых в FEATURES стоит 'occluder'), и объекты, целиком попавшие под
+закрытое, выкидываются.
+Так как все картинки выводятся по центру экрана по высоте, закрытое в каждом столбце
+можно хранить одним отрезком.
+'''
+
+import math
+from array import array
+
+#Сколько пикселей запаса брать с каждой стороны (округления при масштабировании и
+#выводе картинок и рёбра трапеций у стен), чтобы не выкинуть то, что видно хоть чуть-чуть.
+OCCLUSION_MARGIN = 2
+
+class CoverageBuffer:
+    '''
+    Одномерный буфер закрытого: по отрезку [top, bottom) на каждый столбец экрана.
+    width, height : int -- размер экрана.
+    tops, bottoms : array('d') -- верх и низ закрытого отрезка в каждом столбце (если
+    верх не выше низа, столбец ничем не закрыт).
+    '''
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.clear()
+
+    def clear(self):
+        '''
+        Открывает все столбцы.
+        '''
+        self.tops = array('d', [self.height]) * self.width
+        self.bottoms = array('d', [0]) * self.width
+
+    def is_covered(self, left, right, top, bottom):
+        '''
+        Возвращает истину, если прямоугольник от столбца left : float до right : float и от
+        строки top : float до bottom : float (вместе с запасом OCCLUSION_MARGIN) закрыт
+        целиком. Всё, что за пределами экрана, считается закрытым.
+        '''
+        left = max(math.floor(left) - OCCLUSION_MARGIN, 0)
+        right = min(math.ceil(right) + OCCLUSION_MARGIN, self.width)
+        top = max(math.floor(top) - OCCLUSION_MARGIN, 0)
+        bottom = min(math.ceil(bottom) + OCCLUSION_MARGIN, self.height)
+        if left >= right or top >= bottom:
+            return True
+        return max(self.tops[left:right]) <= top and min(self.bottoms[left:right]) >= bottom
+
+    def cover(self, left, right, left_top, left_bottom, right_top, right_bottom):
+        '''
+        Закрывает трапецию от столбца left : float до right : float, у которой на левом
+        краю закрыты строки от left_top : float до left_bottom : float, а на правом -- от
+        right_top : float до right_bottom : float (между краями -- линейно). Прямоугольник --
+        это трапеция с одинаковыми краями. С каждой стороны отступается OCCLUSION_MARGIN.
+        '''
+        first = max(math.ceil(left) + OCCLUSION_MARGIN, 0)
+        last = min(math.floor(right) - OCCLUSION_MARGIN, self.width)
+        for column in range(first, last):
+            part = (column - left) / (right - left)
+            top = math.ceil(left_top + (right_top - left_top) * part) + OCCLUSION_MARGIN
+            bottom = math.floor(left_bottom + (right_bottom - left_bottom) * part) - OCCLUSION_MARGIN
+            if top >= bottom:
+                continue
+            old_top = self.tops[column]
+            old_bottom = self.bottoms[column]
+            if old_top >= old_bottom or (top <= old_top and bottom >= old_bottom):
+                self.tops[column] = top
+                self.bottoms[column] = bottom
+            elif top <= old_bottom and bottom >= old_top:
+                self.tops[column] = min(top, old_top)
+                self.bottoms[column] = max(bottom, old_bottom)
+
+class OcclusionCuller:
+    '''
+    Отсекает закрытые объекты перед отрисовкой кадра (см. cull).
+    buffer : CoverageBuffer -- буфер закрытого (заводится под размер экрана).
+    culled, drawn : int -- сколько объектов выкинуто и сколько оставлено в последнем кадре.
+    total_culled, total_drawn : int -- то же самое за все кадры с последнего reset_stats.
+    '''
+    def __init__(self):
+        self.buffer = None
+        self.culled = 0
+        self.drawn = 0
+        self.total_culled = 0
+        self.total_drawn = 0
+
+    def cull(self, objects, width, height, get_footprint):
+        '''
+        Возвращает те объекты из objects (в том же порядке), которые на экране размера
+        width : int на height : int не будут целиком закрыты объектами, которые рисуются
+        после них. objects должны идти в порядке отрисовки (от дальнего к ближнему).
+        get_footprint(obj) должна возвращать для объекта пару:
+        ((left, right, top, bottom) -- прямоугольник, который объект может закрасить,
+        (left, right, left_top, left_bottom, right_top, right_bottom) -- что он закрывает
+        наверняка (см. CoverageBuffer.cover) или None, если объект прозрачный).
+        '''
+        if self.buffer is None or self.buffer.width != width or self.buffer.height != height:
+            self.buffer = CoverageBuffer(width, height)
+        else:
+            self.buffer.clear()
+        visible = []
+        for obj in reversed(objects):
+            bounds, opaque = get_footprint(obj)
+            if self.buffer.is_covered(*bounds):
+                continue
+            visible.append(obj)
+            if opaque is not None:
+                self.buffer.cover(*opaque)
+        visible.reverse()
+        self.drawn = len(visible)
+        self.culled = len(objects) - self.drawn
+        self.total_drawn += self.drawn
+        self.total_culled += self.culled
+        return visible
+
+    def get_stats(self):
+        '''
+        Возвращает словарь со счётчиками отсечения.
+        '''
+        total = self.total_culled + self.total_drawn
+        return {
+            'culled' : self.culled,
+            'drawn' : self.drawn,
+            'total_culled' : self.total_culled,
+            'total_drawn' : self.total_drawn,
+            'cull_rate' : self.total_culled / total if total else 0,
+        }
+
+    def reset_stats(self):
+        '''
+        Обнуляет счётчики за все кадры.
+        '''
+        self.total_culled = 0
+        self.total_drawn = 0
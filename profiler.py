@@ -0,0 +1,172 @@
+'''
+Модуль содержит встроенный профилировщик кадра: замеры времени этапов (span),
+счётчики (count) и журнал последних кадров, который можно вывести на экран поверх игры
+или записать в JSON или CSV.
+Включается переменной окружения ZOMBIE_PROFILE=1 (до запуска игры). Если она не задана,
+span и count подменяются пустышками, так что профилировщик почти ничего не стоит.
+ZOMBIE_PROFILE_OVERLAY=0 -- не выводить замеры на экран.
+ZOMBIE_PROFILE_OUTPUT=<путь.json или путь.csv> -- куда время от времени записывать журнал.
+Пример:
+    with profiler.span('get_sight'):
+        objects = game_map.get_sight()
+    profiler.count('objects_considered', len(objects))
+    ...
+    profiler.end_frame()
+'''
+
+import collections
+import csv
+import json
+import os
+import time
+
+#Включён ли профилировщик.
+ENABLED = os.environ.get('ZOMBIE_PROFILE', '0') not in ('', '0')
+#Выводить ли замеры на экран (если профилировщик включён).
+OVERLAY = os.environ.get('ZOMBIE_PROFILE_OVERLAY', '1') not in ('', '0')
+#Куда записывать журнал (None -- никуда).
+OUTPUT = os.environ.get('ZOMBIE_PROFILE_OUTPUT') or None
+#Сколько последних кадров помнить.
+STD_HISTORY = 300
+#Раз во сколько кадров переписывать файл журнала.
+STD_EXPORT_EVERY = 60
+
+class Span:
+    '''
+    Замер одного этапа: при выходе из with время прибавляется к этапу name : str
+    текущего кадра профилировщика profiler : Profiler.
+    '''
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        spans = self.profiler.spans
+        spans[self.name] = spans.get(self.name, 0) + time.perf_counter() - self.start
+        return False
+
+class NullSpan:
+    '''
+    Замер, который ничего не замеряет (когда профилировщик выключен).
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Profiler:
+    '''
+    Профилировщик кадров.
+    spans : {str : float} -- сколько секунд ушло на каждый этап в текущем кадре (если этап
+    встречается в кадре несколько раз, время складывается).
+    counters : {str : int} -- счётчики текущего кадра.
+    history : deque -- последние кадры (не больше history_size), каждый -- словарь
+    {'frame' : int, 'time' : float, 'spans' : {str : float}, 'counters' : {str : int}},
+    время этапов -- в миллисекундах.
+    frames : int -- сколько кадров всего завершено.
+    output : str -- куда раз в export_every кадров записывается журнал (None -- никуда).
+    '''
+    def __init__(self, history_size=STD_HISTORY, output=None, export_every=STD_EXPORT_EVERY):
+        if history_size < 1:
+            raise ValueError('Помнить меньше одного кадра -- это уже не профилировщик.')
+        self.spans = dict()
+        self.counters = dict()
+        self.history = collections.deque(maxlen=history_size)
+        self.frames = 0
+        self.output = output
+        self.export_every = export_every
+
+    def span(self, name):
+        '''
+        Возвращает замер этапа name : str (его нужно использовать в with).
+        '''
+        return Span(self, name)
+
+    def count(self, name, value=1):
+        '''
+        Прибавляет value : int к счётчику name : str текущего кадра.
+        '''
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def end_frame(self):
+        '''
+        Завершает текущий кадр: кладёт его замеры в history и начинает следующий. Раз в
+        export_every кадров переписывает файл журнала output.
+        '''
+        self.history.append({
+            'frame' : self.frames,
+            'time' : time.time(),
+            'spans' : {name : value * 1000 for name, value in self.spans.items()},
+            'counters' : self.counters,
+        })
+        self.spans = dict()
+        self.counters = dict()
+        self.frames += 1
+        if self.output is not None and self.frames % self.export_every == 0:
+            self.export(self.output)
+
+    def get_last_frame(self):
+        '''
+        Возвращает последний завершённый кадр (см. history) или None, если кадров ещё не было.
+        '''
+        if not self.history:
+            return None
+        return self.history[-1]
+
+    def get_summary(self):
+        '''
+        Возвращает среднее время каждого этапа (в миллисекундах) и среднее значение каждого
+        счётчика по кадрам из history: {'spans' : {str : float}, 'counters' : {str : float}}.
+        '''
+        summary = {'spans' : dict(), 'counters' : dict()}
+        for frame in self.history:
+            for part in ('spans', 'counters'):
+                for name, value in frame[part].items():
+                    summary[part][name] = summary[part].get(name, 0) + value / len(self.history)
+        return summary
+
+    def export(self, path):
+        '''
+        Записывает history в файл path : str: в CSV (по строке на кадр, по столбцу на этап и
+        счётчик), если путь кончается на .csv, иначе -- в JSON.
+        '''
+        if path.endswith('.csv'):
+            span_names = sorted({name for frame in self.history for name in frame['spans']})
+            counter_names = sorted({name for frame in self.history for name in frame['counters']})
+            with open(path, 'w', newline='') as output_file:
+                writer = csv.writer(output_file)
+                writer.writerow(['frame', 'time'] + span_names + counter_names)
+                for frame in self.history:
+                    writer.writerow([frame['frame'], frame['time']]\
+                    + [frame['spans'].get(name, '') for name in span_names]\
+                    + [frame['counters'].get(name, '') for name in counter_names])
+        else:
+            with open(path, 'w') as output_file:
+                json.dump(list(self.history), output_file, indent=4)
+
+PROFILER = Profiler(output=OUTPUT)
+
+if ENABLED:
+    span = PROFILER.span
+    count = PROFILER.count
+    end_frame = PROFILER.end_frame
+else:
+    def span(name):
+        return NULL_SPAN
+
+    def count(name, value=1):
+        pass
+
+    def end_frame():
+        pass
@@ -0,0 +1,124 @@
+'''
+Модуль содержит кэш поля зрения, который позволяет не пересчитывать всё с нуля каждый
+кадр.
+Чаще всего между кадрами игрок только поворачивается (а положение объектов
+относительно него не меняется), поэтому полярные углы объектов вокруг игрока можно
+посчитать один раз, отсортировать, а в каждом кадре двоичным поиском брать те, что
+попали в конус зрения.
+'''
+
+import bisect
+import math
+
+import game_object
+
+class SightCache:
+    '''
+    Кэш полярных углов объектов вокруг того, от чьего лица ведётся наблюдение.
+    game_map : GameMap -- карта, для которой ведётся кэш.
+    sight : int -- индекс наблюдателя, для которого кэш построен (None -- кэш пуст).
+    origin : (float, float) -- координаты наблюдателя, для которых кэш построен.
+    radius : float -- радиус, внутри которого объекты попали в кэш.
+    angles : [float] -- отсортированные полярные углы объектов (от 0 до 360) относительно
+    origin.
+    items : [int] -- индексы объектов в том же порядке, что и angles.
+    rebuilds : int -- сколько раз кэш строился заново (для замеров).
+    Положение объектов кэш отслеживает сам (он подписан на изменения в game_map.objects):
+    сдвинутый объект просто переставляется в нужное место, а сдвиг самого наблюдателя
+    сбрасывает кэш целиком.
+    '''
+    def __init__(self, game_map):
+        self.game_map = game_map
+        self.sight = None
+        self.origin = None
+        self.radius = None
+        self.angles = []
+        self.items = []
+        self.rebuilds = 0
+        game_map.objects.listeners.append(self.on_object_moved)
+
+    def invalidate(self):
+        '''
+        Сбрасывает кэш: при следующем запросе он будет построен заново.
+        '''
+        self.sight = None
+        self.angles = []
+        self.items = []
+
+    def rebuild(self, radius):
+        '''
+        Строит кэш заново для текущего наблюдателя: берёт из пространственного индекса
+        объекты не дальше radius : float от него и сортирует их по полярному углу.
+        '''
+        self.sight = self.game_map.sight
+        self.origin = self.game_map.objects[self.sight].coords
+        self.radius = radius
+        entries = sorted((self.get_angle(obj_index), obj_index)\
+        for obj_index in self.game_map.index.query_radius(self.origin, radius))
+        self.angles = [entry[0] for entry in entries]
+        self.items = [entry[1] for entry in entries]
+        self.rebuilds += 1
+
+    def get_angle(self, obj_index):
+        '''
+        Возвращает полярный угол (от 0 до 360) объекта под индексом obj_index : int
+        относительно origin.
+        '''
+        objects = self.game_map.objects
+        return math.atan2(objects.ys[obj_index] - self.origin[1],\
+        objects.xs[obj_index] - self.origin[0]) * 180 / math.pi % 360
+
+    def on_object_moved(self, obj_index, old_coords, new_coords):
+        '''
+        Вызывается хранилищем объектов, когда объект obj_index : int появился на карте
+        (old_coords равно None), переместился из old_coords : (float, float) в
+        new_coords : (float, float) или был удалён (new_coords равно None).
+        '''
+        if self.sight is None:
+            return
+        if obj_index == self.sight:
+            self.invalidate()
+            return
+        if old_coords is not None:
+            self.remove(obj_index, old_coords)
+        if new_coords is None or not self.game_map.objects.flags[obj_index] & game_object.FLAG_RESIZABLE:
+            return
+        if (new_coords[0] - self.origin[0]) ** 2 + (new_coords[1] - self.origin[1]) ** 2\
+        <= self.radius ** 2:
+            angle = self.get_angle(obj_index)
+            position = bisect.bisect_right(self.angles, angle)
+            self.angles.insert(position, angle)
+            self.items.insert(position, obj_index)
+
+    def remove(self, obj_index, coords):
+        '''
+        Убирает из кэша объект obj_index : int, который стоял в точке coords : (float, float)
+        (если он там был).
+        '''
+        angle = math.atan2(coords[1] - self.origin[1], coords[0] - self.origin[0]) * 180 / math.pi % 360
+        position = bisect.bisect_left(self.angles, angle)
+        while position < len(self.items) and self.angles[position] == angle:
+            if self.items[position] == obj_index:
+                del self.angles[position]
+                del self.items[position]
+                return
+            position += 1
+
+    def query(self, radius, left_angle, vision_angle, eps=0):
+        '''
+        Возвращает список индексов объектов, которые лежат не дальше radius : float от
+        наблюдателя и внутри угла от left_angle : float шириной vision_angle : float
+        градусов (против часовой стрелки), расширенного на eps : float с каждой стороны.
+        Кэш перестраивается, если наблюдатель сменился, сдвинулся или у него поменялся
+        радиус.
+        '''
+        if self.sight != self.game_map.sight or self.radius != radius:
+            self.rebuild(radius)
+        if vision_angle + 2 * eps >= 360:
+            return list(self.items)
+        low = (left_angle - eps) % 360
+        high = low + vision_angle + 2 * eps
+        found = self.items[bisect.bisect_left(self.angles, low):bisect.bisect_right(self.angles, high)]
+        if high > 360:
+            found += self.items[:bisect.bisect_right(self.angles, high - 360)]
+        return found
@@ -0,0 +1,211 @@
+'''
+Модуль позволяет гонять игру без окна: проигрывать записанные нажатия (по списку действий
+на тик, см. game_map.ACTIONS) на игровой карте с максимальной скоростью, а также сохранять
+состояние карты в снимок (snapshot) и восстанавливать его.
+Запись нажатий -- текстовый файл, по строке на тик, действия в строке через пробел
+(пустая строка -- тик, в котором ничего не нажато).
+Снимок -- заголовок SNAPSHOT (MAGIC, версия, номер наблюдателя среди объектов и
+направление взгляда), а за ним объекты, стены и биомы в формате map_format.
+Запуск: python -m simulation <запись> [--snapshot снимок] [--save снимок] [--repeat N]
+[--no-sight] [--world папка [--chunk-size S]]
+или python -m simulation --random N [--seed S] ... -- N тиков случайных нажатий.
+По умолчанию в каждом тике считается и то, что нужно для кадра (поле зрения и биомы);
+--no-sight оставляет только apply_action. --world подгружает куски мира из папки
+(см. chunks.save_world) по мере того, как наблюдатель по нему ходит.
+'''
+
+import argparse
+import random
+import struct
+import sys
+import time
+
+import chunks
+import game_map
+import game_object
+import map_format
+
+SNAPSHOT_MAGIC = b'ZSNP'
+SNAPSHOT_VERSION = 1
+SNAPSHOT = struct.Struct('<4sHid')
+
+#Где стоит Солнце (очень далеко).
+INF = 10 ** 10
+
+def read_inputs(path):
+    '''
+    Читает запись нажатий из файла path : str и возвращает список тиков [[str]].
+    '''
+    with open(path) as input_file:
+        return [line.split() for line in input_file.read().splitlines()]
+
+def write_inputs(path, ticks):
+    '''
+    Записывает тики ticks : [[str]] (действия на каждый тик) в файл path : str.
+    '''
+    with open(path, 'w') as output_file:
+        for actions in ticks:
+            output_file.write(' '.join(actions) + '\n')
+
+def get_random_inputs(ticks_number, seed=0):
+    '''
+    Возвращает ticks_number : int тиков случайных нажатий (одинаковые seed дают одинаковые
+    нажатия).
+    '''
+    rand = random.Random(seed)
+    return [rand.sample(game_map.ACTIONS, rand.randint(0, 2)) for tick in range(ticks_number)]
+
+def replay(scene, ticks, sight=False, world=None):
+    '''
+    Проигрывает тики ticks : [[str]] на карте scene : GameMap (так же, как это делает
+    interface.main, только без окна и без ожидания) и возвращает число тиков.
+    sight : bool -- считать ли в каждом тике поле зрения (get_sight) и биомы
+    (get_biom_info) наблюдателя, как для отрисовки кадра.
+    world : chunks.ChunkedWorld -- мир из кусков, подгружаемый в scene (его update
+    зовётся в каждом тике после ходов).
+    '''
+    for actions in ticks:
+        for action in actions:
+            scene.apply_action(action)
+        if world is not None:
+            world.update()
+        if sight:
+            scene.get_sight()
+            scene.get_biom_info()
+    return len(ticks)
+
+def pack_snapshot(scene):
+    '''
+    Упаковывает в байты (bytes) всё состояние карты scene : GameMap: живые объекты (с hp и
+    видимостью), стены, биомы, наблюдателя и направление взгляда.
+    Индексы объектов при восстановлении идут подряд, поэтому могут не совпасть с прежними
+    (если объекты удалялись). Стены и биомы записываются с их номерами из wall_order и
+    biom_order, так что наложение биомов и порядок стен восстанавливаются как были, даже
+    если они подгружались по кускам не в том порядке, в каком добавлялись.
+    '''
+    objects = []
+    sight = -1
+    for obj in scene.objects:
+        if not scene.objects.is_alive(obj.index):
+            continue
+        if obj.index == scene.sight:
+            sight = len(objects)
+        objects.append((obj.name, obj.coords, obj.hp, scene.objects.flags[obj.index]))
+    header = SNAPSHOT.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sight, scene.sight_dir)
+    walls = [(scene.wall_order[wall], wall) for wall in scene.walls]
+    bioms = [(scene.biom_order[biom], biom) for biom in scene.bioms]
+    return header + map_format.pack(objects, walls, bioms)
+
+def unpack_snapshot(buffer):
+    '''
+    Восстанавливает карту из буфера buffer (bytes, memoryview или mmap), записанного
+    pack_snapshot, и возвращает новую GameMap (направление взгляда приводится к
+    промежутку от 0 до 360, как это делает GameMap.apply_action).
+    Обрезанный или чужой снимок даёт ValueError (см. и map_format.unpack).
+    '''
+    if len(buffer) < SNAPSHOT.size:
+        raise ValueError('Это не снимок игры (или снимок из другой версии игры).')
+    magic, version, sight, sight_dir = SNAPSHOT.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError('Это не снимок игры (или снимок из другой версии игры).')
+    objects, walls, bioms = map_format.unpack(memoryview(buffer)[SNAPSHOT.size:])
+    scene = game_map.GameMap()
+    for position, (name, coords, hp, flags) in enumerate(objects):
+        obj_index = scene.add_object(name, coords, position == sight)
+        scene.objects.hp[obj_index] = hp
+        scene.objects[obj_index].is_visible = flags & game_object.FLAG_VISIBLE
+    for wall_id, wall in walls:
+        scene.insert_wall(wall, wall_id)
+    for biom_id, biom in bioms:
+        scene.add_biom(biom.center, biom.radius, biom.type, biom_id)
+    scene.sight_dir = game_map.degree(int(sight_dir) if sight_dir.is_integer() else sight_dir)
+    return scene
+
+def save_snapshot(path, scene):
+    '''
+    Записывает снимок карты scene : GameMap в файл path : str.
+    '''
+    with open(path, 'wb') as output_file:
+        output_file.write(pack_snapshot(scene))
+
+def load_snapshot(path):
+    '''
+    Читает снимок из файла path : str и возвращает восстановленную GameMap.
+    '''
+    with open(path, 'rb') as input_file:
+        return unpack_snapshot(input_file.read())
+
+def get_std_scene():
+    '''
+    Возвращает карту, с которой начинается игра.
+    '''
+    scene = game_map.GameMap()
+    scene.add_object('zombie', (0, 0), True)
+    scene.add_object('zombie', (0, 7))
+    scene.add_object('zombie', (0, -7))
+    scene.add_object('tree', (3, 5))
+    scene.add_object('tree', (-4, -2))
+    scene.add_object('sun', (INF, 2 * INF))
+    scene.add_wall((-10, 8), (10, 9))
+    return scene
+
+def get_world_scene():
+    '''
+    Возвращает карту для мира из кусков: на ней только наблюдатель и Солнце, остальное
+    подгружается.
+    '''
+    scene = game_map.GameMap()
+    scene.add_object('zombie', (0, 0), True)
+    scene.add_object('sun', (INF, 2 * INF))
+    return scene
+
+def main(ticks, snapshot, save, repeat, sight=True, world_path=None, chunk_size=chunks.STD_CHUNK_SIZE):
+    '''
+    Проигрывает тики ticks : [[str]] repeat : int раз подряд на карте из снимка
+    snapshot : str (None -- на карте, с которой начинается игра), пишет в stderr, сколько
+    тиков в секунду вышло и где оказался наблюдатель, и, если save : str не None,
+    сохраняет туда снимок получившейся карты.
+    sight : bool -- считать ли в каждом тике поле зрения и биомы (см. replay).
+    world_path : str -- папка с кусками мира (см. chunks.save_world), которые подгружаются
+    со стороной chunk_size : float; без снимка на карте вначале только наблюдатель и
+    Солнце. В конце куски выгружаются обратно на диск.
+    '''
+    if snapshot is not None:
+        scene = load_snapshot(snapshot)
+    elif world_path is not None:
+        scene = get_world_scene()
+    else:
+        scene = get_std_scene()
+    world = chunks.ChunkedWorld(scene, world_path, chunk_size) if world_path is not None else None
+    start = time.perf_counter()
+    ticks_number = 0
+    for i in range(repeat):
+        ticks_number += replay(scene, ticks, sight, world)
+    duration = time.perf_counter() - start
+    print('{} ticks in {:.3f} s ({:.0f} ticks/s), sighter at {}, looking at {}'.format(ticks_number,\
+    duration, ticks_number / duration if duration else float('inf'),\
+    scene.objects[scene.sight].coords, scene.sight_dir), file=sys.stderr)
+    if save is not None:
+        save_snapshot(save, scene)
+    if world is not None:
+        world.unload_all()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Проигрывание записанных нажатий без окна.')
+    parser.add_argument('inputs', nargs='?', help='файл с записью нажатий')
+    parser.add_argument('--random', type=int, help='вместо записи -- столько тиков случайных нажатий')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--snapshot', help='с какого снимка начать (по умолчанию -- с начала игры)')
+    parser.add_argument('--save', help='куда сохранить снимок в конце')
+    parser.add_argument('--repeat', type=int, default=1, help='сколько раз проиграть запись')
+    parser.add_argument('--no-sight', action='store_true', help='не считать поле зрения и биомы в тиках')
+    parser.add_argument('--world', help='папка с кусками мира (см. chunks.save_world)')
+    parser.add_argument('--chunk-size', type=float, default=chunks.STD_CHUNK_SIZE)
+    args = parser.parse_args()
+    if args.random is not None:
+        ticks = get_random_inputs(args.random, args.seed)
+    elif args.inputs is not None:
+        ticks = read_inputs(args.inputs)
+    else:
+        parser.error('нужна запись нажатий или --random')
+    main(ticks, args.snapshot, args.save, args.repeat, not args.no_sight, args.world, args.chunk_size)
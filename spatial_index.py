@@ -0,0 +1,271 @@
+'''
+Модуль содержит пространственный индекс для объектов игровой карты.
+Индекс нужен, чтобы не перебирать всю карту, когда нужно узнать, что находится
+рядом с некоторой точкой (например, что видит игрок).
+'''
+
+import math
+import sys
+from array import array
+
+import angles
+
+#Таблица синусов и косинусов для сторон угла в query_wedge (если своей не передали).
+ANGLES = angles.AngleTable()
+
+class Grid:
+    '''
+    Равномерная сетка: плоскость поделена на квадратные клетки со стороной cell_size, и
+    для каждой непустой клетки хранится, что в ней лежит. Что именно и как это попадает в
+    клетки, решают наследники (UniformGrid -- точки, ShapeGrid -- фигуры).
+    cell_size : float -- сторона клетки.
+    cells : {(int, int) : list} -- содержимое каждой непустой клетки.
+    '''
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError('Клетка сетки должна быть положительного размера, не надо так.')
+        self.cell_size = cell_size
+        self.cells = dict()
+
+    def get_cell(self, coords):
+        '''
+        Возвращает клетку (int, int), в которую попадает точка coords : (float, float).
+        '''
+        return (math.floor(coords[0] / self.cell_size), math.floor(coords[1] / self.cell_size))
+
+    def get_box_cells(self, left, bottom, right, top):
+        '''
+        Возвращает список всех клеток (занятых и пустых), которые задевает прямоугольник от
+        (left, bottom) до (right, top).
+        '''
+        left_cell, bottom_cell = self.get_cell((left, bottom))
+        right_cell, top_cell = self.get_cell((right, top))
+        return [(cell_x, cell_y) for cell_x in range(left_cell, right_cell + 1)\
+        for cell_y in range(bottom_cell, top_cell + 1)]
+
+    def get_box_contents(self, left, bottom, right, top):
+        '''
+        Возвращает список содержимого занятых клеток, которые задевает прямоугольник от
+        (left, bottom) до (right, top).
+        '''
+        left_cell, bottom_cell = self.get_cell((left, bottom))
+        right_cell, top_cell = self.get_cell((right, top))
+        if (right_cell - left_cell + 1) * (top_cell - bottom_cell + 1) > len(self.cells):
+            #Прямоугольник накрывает больше клеток, чем их вообще занято, -- проще пройтись
+            #по занятым.
+            return [self.cells[cell] for cell in self.cells\
+            if left_cell <= cell[0] <= right_cell and bottom_cell <= cell[1] <= top_cell]
+        contents = []
+        for cell_x in range(left_cell, right_cell + 1):
+            for cell_y in range(bottom_cell, top_cell + 1):
+                if (cell_x, cell_y) in self.cells:
+                    contents.append(self.cells[(cell_x, cell_y)])
+        return contents
+
+class UniformGrid(Grid):
+    '''
+    Сетка для точек.
+    Элементы -- это номера строк в массивах координат xs и ys (например, номера объектов в
+    game_object.ObjectStore): сама сетка координаты не копирует, а берёт их оттуда.
+    xs, ys : array('d') -- координаты элементов.
+    cells : {(int, int) : array('l')} -- номера элементов в каждой непустой клетке.
+    Объекты с огромными координатами (вроде Солнца) в сетку класть не стоит: клетку
+    для них найти можно, но запрос радиусом до них будет перебирать миллиарды клеток.
+    '''
+    def __init__(self, cell_size, xs, ys):
+        super().__init__(cell_size)
+        self.xs = xs
+        self.ys = ys
+
+    def insert(self, item, coords):
+        '''
+        Кладёт в сетку элемент item : int, находящийся в точке coords : (float, float).
+        '''
+        cell = self.get_cell(coords)
+        if not cell in self.cells:
+            self.cells[cell] = array('l')
+        self.cells[cell].append(item)
+
+    def remove(self, item, coords):
+        '''
+        Убирает из сетки элемент item : int, который был положен в точку
+        coords : (float, float).
+        '''
+        cell = self.get_cell(coords)
+        self.cells[cell].remove(item)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def move(self, item, old_coords, new_coords):
+        '''
+        Переносит элемент item : int из точки old_coords : (float, float) в точку
+        new_coords : (float, float). Сами координаты в xs и ys меняет вызывающий.
+        '''
+        if self.get_cell(old_coords) != self.get_cell(new_coords):
+            self.remove(item, old_coords)
+            self.insert(item, new_coords)
+
+    def query_radius(self, center, radius):
+        '''
+        Возвращает список элементов, которые лежат не дальше radius : float от точки
+        center : (float, float).
+        '''
+        found = []
+        xs = self.xs
+        ys = self.ys
+        center_x = center[0]
+        center_y = center[1]
+        radius_sqr = radius * radius
+        for cell in self.get_box_contents(center_x - radius, center_y - radius, center_x + radius,\
+        center_y + radius):
+            for item in cell:
+                if (xs[item] - center_x) ** 2 + (ys[item] - center_y) ** 2 <= radius_sqr:
+                    found.append(item)
+        return found
+
+    def query_wedge(self, center, radius, left_angle, right_angle, eps=0, table=None):
+        '''
+        Возвращает список элементов, которые лежат не дальше radius : float от точки
+        center : (float, float) и внутри угла, который идёт против часовой стрелки от
+        left_angle : float до right_angle : float (в градусах, как в тригонометрии).
+        eps : float -- на сколько градусов расширить угол с каждой стороны (чтобы не
+        потерять элементы, лежащие ровно на его сторонах).
+        table : angles.AngleTable -- откуда брать стороны угла (по умолчанию ANGLES).
+        Попадание в угол проверяет table.get_cone_mask.
+        '''
+        width = (right_angle - left_angle) % 360
+        if width + 2 * eps >= 360:
+            return self.query_radius(center, radius)
+        if table is None:
+            table = ANGLES
+        items = self.query_radius(center, radius)
+        xs = self.xs
+        ys = self.ys
+        obj_xs = [xs[item] - center[0] for item in items]
+        obj_ys = [ys[item] - center[1] for item in items]
+        mask = table.get_cone_mask(obj_xs, obj_ys, left_angle, right_angle, eps, width)
+        return [item for item, in_cone in zip(items, mask) if in_cone]
+
+class ShapeGrid(Grid):
+    '''
+    Сетка для фигур (кругов, отрезков и т.д.): каждая фигура записана во все клетки,
+    которые она задевает (get_covered_cells), так что для круга поиска достаточно
+    проверить только фигуры из задетых им клеток.
+    cells : {(int, int) : [item]} -- фигуры, задевающие каждую клетку.
+    Наследники определяют get_covered_cells и get_dist_sqr.
+    '''
+    def get_covered_cells(self, item):
+        '''
+        Возвращает список клеток, которые задевает фигура item.
+        '''
+        raise NotImplementedError
+
+    def get_dist_sqr(self, item, coords):
+        '''
+        Возвращает квадрат расстояния от точки coords : (float, float) до фигуры item
+        (0, если точка внутри неё).
+        '''
+        raise NotImplementedError
+
+    def insert(self, item):
+        '''
+        Кладёт в сетку фигуру item.
+        '''
+        for cell in self.get_covered_cells(item):
+            if not cell in self.cells:
+                self.cells[cell] = []
+            self.cells[cell].append(item)
+
+    def remove(self, item):
+        '''
+        Убирает из сетки фигуру item.
+        '''
+        for cell in self.get_covered_cells(item):
+            self.cells[cell].remove(item)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def query_radius(self, center, radius):
+        '''
+        Возвращает список фигур (без повторов), которые проходят не дальше radius : float от
+        точки center : (float, float).
+        '''
+        found = []
+        checked = set()
+        radius_sqr = radius * radius
+        for cell in self.get_box_contents(center[0] - radius, center[1] - radius, center[0] + radius,\
+        center[1] + radius):
+            for item in cell:
+                if id(item) in checked:
+                    continue
+                checked.add(id(item))
+                if self.get_dist_sqr(item, center) <= radius_sqr:
+                    found.append(item)
+        return found
+
+    def query_point(self, coords):
+        '''
+        Возвращает список фигур, в которые попадает точка coords : (float, float).
+        Точка лежит ровно в одной клетке, так что хватает фигур из неё.
+        '''
+        cell = self.get_cell(coords)
+        if not cell in self.cells:
+            return []
+        return [item for item in self.cells[cell] if self.get_dist_sqr(item, coords) == 0]
+
+class CircleGrid(ShapeGrid):
+    '''
+    Сетка для кругов (например, биомов): круг записан во все клетки, которые задевает его
+    описанный квадрат. Круги -- это любые объекты с полями center : (float, float) и
+    radius : float.
+    '''
+    def get_covered_cells(self, item):
+        '''
+        Возвращает список клеток, которые задевает описанный квадрат круга item.
+        '''
+        return self.get_box_cells(item.center[0] - item.radius, item.center[1] - item.radius,\
+        item.center[0] + item.radius, item.center[1] + item.radius)
+
+    def get_dist_sqr(self, item, coords):
+        '''
+        Возвращает квадрат расстояния от точки coords : (float, float) до круга item.
+        '''
+        dist_sqr = (item.center[0] - coords[0]) ** 2 + (item.center[1] - coords[1]) ** 2
+        if dist_sqr <= item.radius ** 2:
+            return 0
+        #Точка снаружи, так что ноль (если корень округлился до радиуса) тут не годится.
+        return (dist_sqr ** 0.5 - item.radius) ** 2 or sys.float_info.min
+
+class SegmentGrid(ShapeGrid):
+    '''
+    Сетка для отрезков (например, стен): отрезок записан во все клетки, которые задевает
+    его описанный прямоугольник. Отрезки -- это любые объекты с полями
+    start : (float, float) и finish : (float, float).
+    '''
+    def get_covered_cells(self, item):
+        '''
+        Возвращает список клеток, которые задевает описанный прямоугольник отрезка item.
+        '''
+        return self.get_box_cells(min(item.start[0], item.finish[0]), min(item.start[1], item.finish[1]),\
+        max(item.start[0], item.finish[0]), max(item.start[1], item.finish[1]))
+
+    def get_dist_sqr(self, item, coords):
+        '''
+        Возвращает квадрат расстояния от точки coords : (float, float) до отрезка item.
+        '''
+        return get_segment_dist_sqr(item.start, item.finish, coords)
+
+def get_segment_dist_sqr(start, finish, point):
+    '''
+    Возвращает квадрат расстояния от точки point : (float, float) до отрезка от
+    start : (float, float) до finish : (float, float).
+    '''
+    dir_x = finish[0] - start[0]
+    dir_y = finish[1] - start[1]
+    point_x = point[0] - start[0]
+    point_y = point[1] - start[1]
+    length_sqr = dir_x * dir_x + dir_y * dir_y
+    part = 0
+    if length_sqr > 0:
+        part = min(max((point_x * dir_x + point_y * dir_y) / length_sqr, 0), 1)
+    return (point_x - part * dir_x) ** 2 + (point_y - part * dir_y) ** 2
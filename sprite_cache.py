@@ -0,0 +1,170 @@
+'''
+Модуль содержит кэш отмасштабированных картинок.
+pygame.transform.scale -- самое дорогое, что делается при отрисовке кадра, а размеры,
+до которых масштабируются картинки, от кадра к кадру почти не меняются. Поэтому
+отмасштабированные картинки запоминаются и выбрасываются, только когда кэш переполнен
+(сначала -- те, которыми дольше всего не пользовались).
+Кроме того, для больших картинок при загрузке строится цепочка уменьшенных вдвое копий
+(mip-уровней), и масштабируется не сама картинка, а ближайшая подходящая копия.
+'''
+
+import collections
+
+import pygame
+
+#Сколько байт пикселей может занимать кэш по умолчанию.
+STD_MEMORY_BUDGET = 64 * 1024 * 1024
+#Шаг квантования размеров по умолчанию (1 -- размеры не округляются, картинка такая же,
+#как без кэша; чем больше шаг, тем чаще попадания, но тем "ступенчатее" приближение).
+STD_QUANTIZATION = 1
+#Под каким ключом в pictures лежит цепочка уменьшенных копий картинки (к её названию
+#приписывается MIP_SUFFIX).
+MIP_SUFFIX = '_mips'
+
+class SpriteCache:
+    '''
+    Кэш картинок с вытеснением давно не использованных (LRU).
+    memory_budget : int -- сколько байт пикселей могут занимать все картинки в кэше.
+    quantization : int -- шаг (в пикселях), до которого округляются размеры картинок.
+    sprites : OrderedDict -- картинки по ключам, от давно использованных к недавним.
+    memory_used : int -- сколько байт сейчас занято.
+    hits, misses, evictions : int -- счётчики попаданий, промахов и вытеснений.
+    '''
+    def __init__(self, memory_budget=STD_MEMORY_BUDGET, quantization=STD_QUANTIZATION):
+        if memory_budget < 0:
+            raise ValueError('Отрицательный объём памяти под кэш? Мы такое не кэшируем.')
+        if quantization < 1:
+            raise ValueError('Шаг квантования должен быть хотя бы в один пиксель.')
+        self.memory_budget = memory_budget
+        self.quantization = quantization
+        self.sprites = collections.OrderedDict()
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, size):
+        '''
+        Округляет размер size : (float, float) вниз до шага quantization и возвращает
+        (int, int). При шаге 1 это то же самое, что int() от каждой координаты.
+        '''
+        return (int(size[0] / self.quantization) * self.quantization,\
+        int(size[1] / self.quantization) * self.quantization)
+
+    def get(self, key, build):
+        '''
+        Возвращает картинку по ключу key. Если её нет в кэше, она строится вызовом
+        build() и запоминается (если вообще влезает в memory_budget).
+        '''
+        sprite = self.lookup(key)
+        if sprite is None:
+            sprite = build()
+            self.put(key, sprite)
+        return sprite
+
+    def lookup(self, key):
+        '''
+        Возвращает картинку по ключу key или None, если её нет в кэше (это считается промахом).
+        '''
+        if key in self.sprites:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+            return self.sprites[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, sprite):
+        '''
+        Кладёт в кэш картинку sprite : pygame.Surface по ключу key (если она вообще влезает
+        в memory_budget), вытесняя давно не использованные.
+        '''
+        if key in self.sprites:
+            return
+        sprite_size = get_sprite_memory(sprite)
+        if sprite_size > self.memory_budget:
+            return
+        while self.memory_used + sprite_size > self.memory_budget:
+            old_key, old_sprite = self.sprites.popitem(last=False)
+            self.memory_used -= get_sprite_memory(old_sprite)
+            self.evictions += 1
+        self.sprites[key] = sprite
+        self.memory_used += sprite_size
+
+    def get_scaled(self, pictures, name, size):
+        '''
+        Возвращает картинку pictures[name], отмасштабированную до размера size : (int, int)
+        (размер должен быть уже квантован, см. quantize) через scale_picture.
+        '''
+        return self.get((name, size), lambda: scale_picture(pictures, name, size))
+
+    def get_stats(self):
+        '''
+        Возвращает словарь со счётчиками кэша и долей попаданий.
+        '''
+        requests = self.hits + self.misses
+        return {
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'evictions' : self.evictions,
+            'hit_rate' : self.hits / requests if requests else 0,
+            'sprites' : len(self.sprites),
+            'memory_used' : self.memory_used,
+        }
+
+    def reset_stats(self):
+        '''
+        Обнуляет счётчики попаданий, промахов и вытеснений.
+        '''
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        '''
+        Выбрасывает из кэша все картинки.
+        '''
+        self.sprites.clear()
+        self.memory_used = 0
+
+def get_sprite_memory(sprite):
+    '''
+    Возвращает, сколько байт занимают пиксели картинки sprite : pygame.Surface.
+    '''
+    return sprite.get_width() * sprite.get_height() * sprite.get_bytesize()
+
+def build_mip_chain(picture, levels):
+    '''
+    Возвращает список из картинки picture : pygame.Surface и её копий, уменьшенных вдвое,
+    вчетверо и т.д. (не больше levels : int штук и не меньше пикселя в ширину и высоту).
+    Копии уменьшаются сглаживанием (smoothscale), каждая -- из предыдущей.
+    '''
+    chain = [picture]
+    for level in range(levels):
+        size = (chain[-1].get_width() // 2, chain[-1].get_height() // 2)
+        if size[0] < 1 or size[1] < 1:
+            break
+        chain.append(pygame.transform.smoothscale(chain[-1], size))
+    return chain
+
+def get_mip_source(pictures, name, size):
+    '''
+    Возвращает, из чего масштабировать картинку pictures[name] до размера size : (int, int):
+    самый маленький её mip-уровень (см. build_mip_chain), который ещё не меньше size, или
+    саму картинку, если цепочки для неё нет.
+    '''
+    if not name + MIP_SUFFIX in pictures:
+        return pictures[name]
+    chain = pictures[name + MIP_SUFFIX]
+    source = chain[0]
+    for level in chain[1:]:
+        if level.get_width() < size[0] or level.get_height() < size[1]:
+            break
+        source = level
+    return source
+
+def scale_picture(pictures, name, size):
+    '''
+    Возвращает картинку pictures[name], отмасштабированную до размера size : (int, int)
+    (из подходящего mip-уровня, см. get_mip_source).
+    '''
+    return pygame.transform.scale(get_mip_source(pictures, name, size), size)